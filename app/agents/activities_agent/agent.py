@@ -1,17 +1,18 @@
-import json
-
+from common.gateway_llm import gateway_llm
+from common.parsing import SectionParser
+from common.sessions import SessionManager, session_service_from_env
+from common.streaming import run_events
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
+from shared.schemas import ActivityOption
 
 load_dotenv()
 
 activities_agent = Agent(
     name="activities_agent",
-    model=LiteLlm("openai/gpt-4o"),
+    model=gateway_llm(),
     description="Suggests interesting activities for the user at a destination",
     instruction=(
         "Given a destination, dates, and budget, suggest a few engaging tourist or cultural activities."
@@ -20,7 +21,7 @@ activities_agent = Agent(
     ),
 )
 
-session_service = InMemorySessionService()
+session_service = session_service_from_env("activities")
 
 runner = Runner(
     agent=activities_agent,
@@ -31,18 +32,21 @@ runner = Runner(
 USER_ID = "user_activities"
 SESSION_ID = "session_activities"
 
+sessions = SessionManager(
+    session_service, app_name="activities_app", user_id=USER_ID, prefix=SESSION_ID
+)
+
+parse_response = SectionParser("activities", ActivityOption, raw_fallback=True)
+
 
 async def execute(request):
-    # Create a unique session for each request
-    import uuid
+    # Each request gets its own session, released as soon as the run ends
+    async with sessions.session() as session_id:
+        return await _run(request, session_id)
 
-    unique_session_id = f"{SESSION_ID}_{uuid.uuid4().hex[:8]}"
-    await session_service.create_session(
-        app_name="activities_app",
-        user_id=USER_ID,
-        session_id=unique_session_id,
-    )
-    prompt = (
+
+def _prompt(request):
+    return (
         f"User is visiting {request['destination']} from {request['start_date']} to {request['end_date']}."
         f"User has a budget of {request['budget']}. Suggest 2-3 engaging tourist or cultural activities."
         f"Respond in JSON format using the key `activities` with a list of activity objects. "
@@ -51,28 +55,23 @@ async def execute(request):
         f"Example: {{'activities': [{{'name': 'Eiffel Tower Tour', 'description': 'Visit the iconic tower', 'price_estimate': 25, 'duration_hours': 2.5}}]}}"
     )
 
-    message = types.Content(role="user", parts=[types.Part(text=prompt)])
+
+async def _run(request, session_id):
+    message = types.Content(role="user", parts=[types.Part(text=_prompt(request))])
+    result = None
+    # Read the run to its end, so ADK closes its spans before the request ends
     async for event in runner.run_async(
-        user_id=USER_ID, session_id=unique_session_id, new_message=message
+        user_id=USER_ID, session_id=session_id, new_message=message
     ):
         if event.is_final_response():
-            response_text = event.content.parts[0].text
-            try:
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = (
-                        response_text.replace("```json", "").replace("```", "").strip()
-                    )
-                elif response_text.startswith("```"):
-                    response_text = response_text.replace("```", "").strip()
+            result = parse_response.parse_event(event)
+    return result
+
 
-                parsed = json.loads(response_text)
-                if "activities" in parsed and isinstance(parsed["activities"], list):
-                    return {"activities": parsed["activities"]}
-                else:
-                    print("`activities` key missing or not a list in response JSON.")
-                    return {"activities": response_text}  # fallback
-            except json.JSONDecodeError as e:
-                print("JSON parsing failed:", e)
-                print("Response content:", response_text)
-                return {"activities": response_text}  # fallback to raw text
+async def stream(request):
+    # Same run as execute, but yielding tokens and tool calls as they happen
+    async with sessions.session() as session_id:
+        async for event in run_events(
+            runner, USER_ID, session_id, _prompt(request), parse_response
+        ):
+            yield event
@@ -1,4 +1,23 @@
+from common.semantic_cache import semantic_cache_from_env
+
 from .agent import execute
+from .agent import stream as agent_stream
+
+# Activities depend on where, how long and roughly how much, so similar
+# requests share an answer
+cache = semantic_cache_from_env("activities")
+
 
 async def run(payload):
-    return await execute(payload)
\ No newline at end of file
+    return await cache.run(payload, execute)
+
+
+async def stream(payload):
+    cached = await cache.lookup(payload)
+    if cached is not None:
+        yield {"type": "result", "data": cached}
+        return
+    async for event in agent_stream(payload):
+        if event["type"] == "result":
+            await cache.store(payload, event["data"])
+        yield event
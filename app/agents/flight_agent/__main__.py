@@ -1,9 +1,34 @@
+import os
+
 from common.a2a_server import create_app
+from common.admission import admission_from_env
+from common.tasks import task_queue_from_env
 
-from .task_manager import run
+# Imported in the background once the server is listening (ADK, LiteLLM and
+# the MCP client take seconds to import), see create_app
+AGENT = "agents.flight_agent.agent"
+TASKS = "agents.flight_agent.task_manager"
+# Published at /.well-known/agent.json and in the registry the host reads
+CARD = os.path.join(os.path.dirname(__file__), ".well-known", "agent.json")
 
-app = create_app(agent=type("Agent", (), {"execute": run}))
+app = create_app(
+    agent=type(
+        "Agent",
+        (),
+        {
+            "card": CARD,
+            "execute": f"{TASKS}:run",
+            "stream": f"{TASKS}:stream",
+            "cache": f"{TASKS}:cache",
+            "sessions": f"{AGENT}:sessions",
+            "toolset": f"{AGENT}:toolset",
+            "prewarm": f"{AGENT}:prewarm",
+            "admission": admission_from_env("flight"),
+            "tasks": task_queue_from_env("flight"),
+        },
+    )
+)
 if __name__ == "__main__":
-    import uvicorn
+    from common.serving import serve
 
-    uvicorn.run(app, port=8001)
+    serve(app, "agents.flight_agent.__main__:app", port=8001, name="flight")
@@ -1,9 +1,40 @@
+import os
+
 from common.a2a_server import create_app
+from common.admission import admission_from_env
+from common.tasks import task_queue_from_env
+
+from .task_manager import (
+    ACTIVITIES_URL,
+    FLIGHT_URL,
+    STAY_URL,
+    balancer,
+    hedgers,
+    run,
+    run_batch,
+    stream,
+)
 
-from .task_manager import run
+CARD = os.path.join(os.path.dirname(__file__), ".well-known", "agent.json")
 
-app = create_app(agent=type("Agent", (), {"execute": run}))
+app = create_app(
+    agent=type(
+        "Agent",
+        (),
+        {
+            "card": CARD,
+            "execute": run,
+            "stream": stream,
+            "run_batch": run_batch,
+            "hedging": hedgers,
+            "balancer": balancer,
+            "admission": admission_from_env("host"),
+            "tasks": task_queue_from_env("host", run),
+        },
+    ),
+    peers=[FLIGHT_URL, STAY_URL, ACTIVITIES_URL],
+)
 if __name__ == "__main__":
-    import uvicorn
+    from common.serving import serve
 
-    uvicorn.run(app, port=8000)
+    serve(app, "agents.host_agent.__main__:app", port=8000, name="host")
@@ -1,8 +1,8 @@
+from common.gateway_llm import gateway_llm
+from common.sessions import SessionManager, session_service_from_env
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
 load_dotenv()
@@ -10,7 +10,7 @@ load_dotenv()
 
 host_agent = Agent(
     name="host_agent",
-    model=LiteLlm("openai/gpt-4o"),
+    model=gateway_llm(),
     description="Coordinates travel planning by calling flight, stay and activity agents.",
     instruction=(
         "You are the host agent responsible for orchestrating trip planning tasks."
@@ -18,32 +18,36 @@ host_agent = Agent(
     ),
 )
 
-session_service = InMemorySessionService()
+session_service = session_service_from_env("host")
 
 runner = Runner(agent=host_agent, app_name="host_app", session_service=session_service)
 
 USER_ID = "user_host"
 SESSION_ID = "session_host"
 
+sessions = SessionManager(
+    session_service, app_name="host_app", user_id=USER_ID, prefix=SESSION_ID
+)
+
 
 async def execute(request):
-    # Create a unique session for each request
-    import uuid
-
-    unique_session_id = f"{SESSION_ID}_{uuid.uuid4().hex[:8]}"
-    await session_service.create_session(
-        app_name="host_app",
-        user_id=USER_ID,
-        session_id=unique_session_id,
-    )
+    # Each request gets its own session, released as soon as the run ends
+    async with sessions.session() as session_id:
+        return await _run(request, session_id)
+
+
+async def _run(request, session_id):
     prompt = (
         f"Plan a trip to {request['destination']} from {request['start_date']} to {request['end_date']}"
         f"within a total budget of {request['budget']}. Call the flights, stays and activities agents for results."
     )
 
     message = types.Content(role="user", parts=[types.Part(text=prompt)])
+    result = None
+    # Read the run to its end, so ADK closes its spans before the request ends
     async for event in runner.run_async(
-        user_id=USER_ID, session_id=unique_session_id, new_message=message
+        user_id=USER_ID, session_id=session_id, new_message=message
     ):
         if event.is_final_response():
-            return {"summary": event.content.parts[0].text}
+            result = {"summary": event.content.parts[0].text}
+    return result
@@ -0,0 +1,194 @@
+"""
+Combines the sub-agents' answers into complete trips that fit the budget.
+
+An itinerary is one flight, one stay and a set of activities that fits in
+``HOURS_PER_DAY`` hours for each day of the trip. Its score is
+the hours of activities it plans, less ``FLIGHT_HOUR_COST`` per hour of
+flying and ``BUDGET_WEIGHT`` times the share of the budget it spends, so a
+cheaper trip wins when the rest is equal.
+"""
+
+import math
+import os
+from datetime import date
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Complete itineraries the host returns per trip ("0" = none)
+ITINERARIES = int(os.getenv("HOST_ITINERARIES", "3"))
+# Hours of activities one hour of flying is worth giving up
+FLIGHT_HOUR_COST = float(os.getenv("HOST_ITINERARY_FLIGHT_HOUR_COST", "0.5"))
+# Hours of activities worth giving up to not spend the whole budget
+BUDGET_WEIGHT = float(os.getenv("HOST_ITINERARY_BUDGET_WEIGHT", "2"))
+# Hours a day of the trip can hold activities
+HOURS_PER_DAY = float(os.getenv("HOST_ITINERARY_HOURS_PER_DAY", "8"))
+# Activities considered per trip, the best value for their cost and time first
+ACTIVITY_CANDIDATES = 64
+# Most budget steps the activity search works in. A step is a whole number of
+# dollars; prices are rounded up to one, so a plan never goes over budget but
+# may miss one that fits to the dollar
+RESOLUTION = 1000
+# Most time steps, of at least half an hour, for the same search
+HOUR_RESOLUTION = 200
+# Most cells of the table recording which activity improved which budget and
+# time step (one byte each); large budgets over long trips get coarser steps
+# of both instead of a larger table
+MAX_CELLS = 4_000_000
+
+
+def _options(section: Any) -> List[Dict[str, Any]]:
+    # Sections that failed hold a message, and items without a price are skipped
+    if not isinstance(section, list):
+        return []
+    return [
+        option
+        for option in section
+        if isinstance(option, dict)
+        and isinstance(option.get("price_estimate"), (int, float))
+        and option["price_estimate"] >= 0
+    ]
+
+
+def _column(options: List[Dict[str, Any]], field: str) -> np.ndarray:
+    return np.array([float(option.get(field) or 0.0) for option in options])
+
+
+class _ActivityPlans:
+    """Best set of activities for every amount of money left to spend on them.
+
+    A 0/1 knapsack over budget and time steps: ``value[c, t]`` is the best
+    score of activities costing at most ``c`` steps and lasting at most ``t``,
+    and ``taken`` records which item improved which cell so that any one plan
+    can be read back.
+    """
+
+    def __init__(self, activities: List[Dict[str, Any]], budget: float, hours: float):
+        shrink = 1.0
+        while True:
+            self.unit = max(1, math.ceil(budget / (RESOLUTION * shrink)))
+            self.steps = int(budget // self.unit)
+            hour_unit = max(0.5, hours / (HOUR_RESOLUTION * shrink))
+            self.hour_steps = int(hours // hour_unit)
+            cells = ACTIVITY_CANDIDATES * (self.steps + 1) * (self.hour_steps + 1)
+            if cells <= MAX_CELLS:
+                break
+            shrink *= math.sqrt(MAX_CELLS / cells)
+        durations = _column(activities, "duration_hours")
+        prices = _column(activities, "price_estimate")
+        values = durations - BUDGET_WEIGHT * prices / budget
+        weights = np.ceil(prices / self.unit - 1e-9).astype(int)
+        lengths = np.ceil(durations / hour_unit - 1e-9).astype(int)
+        # Activities that cost more than they are worth, or do not fit at all,
+        # never make a plan better; of the rest, keep the best value for the
+        # share of money and time they take
+        fits = (values > 0) & (weights <= self.steps) & (lengths <= self.hour_steps)
+        keep = np.flatnonzero(fits)
+        share = prices[keep] / budget + durations[keep] / max(hours, 1e-9)
+        keep = keep[np.argsort(-values[keep] / np.maximum(share, 1e-9), kind="stable")]
+        keep = keep[:ACTIVITY_CANDIDATES]
+
+        self.activities = [activities[i] for i in keep]
+        self.weights, self.lengths = weights[keep], lengths[keep]
+        shape = (self.steps + 1, self.hour_steps + 1)
+        self.value = np.zeros(shape)
+        self.taken = np.zeros((len(keep), *shape), dtype=bool)
+        for item, i in enumerate(keep):
+            w, d = weights[i], lengths[i]
+            # Every budget and time at once, from the table before this item
+            with_item = np.full(shape, -np.inf)
+            with_item[w:, d:] = self.value[: shape[0] - w, : shape[1] - d] + values[i]
+            better = with_item > self.value
+            self.taken[item] = better
+            self.value = np.where(better, with_item, self.value)
+
+    def capacity(self, money: np.ndarray) -> np.ndarray:
+        steps = np.floor(money / self.unit + 1e-9).astype(int)
+        return np.clip(steps, 0, self.steps)
+
+    def best(self, capacity: np.ndarray) -> np.ndarray:
+        return self.value[capacity, self.hour_steps]
+
+    def plan(self, capacity: int) -> List[Dict[str, Any]]:
+        chosen = []
+        time = self.hour_steps
+        for item in range(len(self.activities) - 1, -1, -1):
+            if self.taken[item, capacity, time]:
+                chosen.append(self.activities[item])
+                capacity -= self.weights[item]
+                time -= self.lengths[item]
+        return chosen[::-1]
+
+
+def plan_itineraries(
+    flights: Any,
+    stays: Any,
+    activities: Any,
+    budget: float,
+    days: int = 1,
+    top: int = ITINERARIES,
+) -> List[Dict[str, Any]]:
+    """The ``top`` best complete itineraries within ``budget``, best first."""
+    flights, stays = _options(flights), _options(stays)
+    if top <= 0 or budget <= 0 or not flights or not stays:
+        return []
+    plans = _ActivityPlans(_options(activities), budget, days * HOURS_PER_DAY)
+
+    flight_prices = _column(flights, "price_estimate")
+    stay_prices = _column(stays, "price_estimate")
+    # Every flight with every stay, scored at once
+    base = flight_prices[:, None] + stay_prices[None, :]
+    left = budget - base
+    capacity = plans.capacity(np.maximum(left, 0))
+    score = (
+        plans.best(capacity)
+        - FLIGHT_HOUR_COST * _column(flights, "duration_hours")[:, None]
+        - BUDGET_WEIGHT * base / budget
+    )
+    score = np.where(left >= 0, score, -np.inf).ravel()
+
+    top = min(top, int(np.isfinite(score).sum()))
+    if top == 0:
+        return []
+    best = np.argpartition(-score, top - 1)[:top]
+    best = best[np.argsort(-score[best], kind="stable")]
+
+    itineraries = []
+    for index in best.tolist():
+        f, s = divmod(index, len(stays))
+        chosen = plans.plan(int(capacity[f, s]))
+        total = float(base[f, s]) + sum(a["price_estimate"] for a in chosen)
+        itineraries.append(
+            {
+                "flight": flights[f],
+                "stay": stays[s],
+                "activities": chosen,
+                "total_price": round(total, 2),
+                "remaining_budget": round(budget - total, 2),
+                "score": round(float(score[index]), 3),
+            }
+        )
+    return itineraries
+
+
+def trip_itineraries(
+    response: Dict[str, Any], payload: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Itineraries for a host response holding the three sections."""
+    try:
+        budget = float(payload.get("budget"))
+        days = (
+            date.fromisoformat(str(payload.get("end_date")).strip())
+            - date.fromisoformat(str(payload.get("start_date")).strip())
+        ).days
+    except (TypeError, ValueError):
+        return []
+    if not math.isfinite(budget):
+        return []
+    return plan_itineraries(
+        response.get("flights"),
+        response.get("stays"),
+        response.get("activities"),
+        budget,
+        days=max(days, 1),
+    )
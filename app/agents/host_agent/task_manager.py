@@ -1,46 +1,331 @@
+import asyncio
 import os
 import sys
+import time
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from common.a2a_client import call_agent
+from common.a2a_client import AgentBusy, call_agent, stream_agent
+from common.balancer import Balancer, unhealthy
+from common.cache import BUDGET_BAND, request_key
+from common.hedging import Hedgers, SkipHedge
+from common.registry import registry_from_env
+from common.telemetry import get_logger
+from pydantic import ValidationError
+from shared.schemas import TravelRequest
 
-FLIGHT_URL = "http://localhost:8001/run"
-STAY_URL = "http://localhost:8002/run"
-ACTIVITIES_URL = "http://localhost:8003/run"
+from .itinerary import trip_itineraries
 
+# Agents are found in the registry by the skill each section needs; these are
+# only called until an agent with that skill has registered
+FLIGHT_URL = "http://localhost:8001"
+STAY_URL = "http://localhost:8002"
+ACTIVITIES_URL = "http://localhost:8003"
+
+logger = get_logger(__name__)
+
+# Per-agent deadlines and the overall request budget, in seconds
+AGENT_TIMEOUTS = {
+    "flights": float(os.getenv("HOST_FLIGHT_TIMEOUT", "45")),
+    "stays": float(os.getenv("HOST_STAY_TIMEOUT", "45")),
+    "activities": float(os.getenv("HOST_ACTIVITIES_TIMEOUT", "45")),
+}
+REQUEST_BUDGET = float(os.getenv("HOST_REQUEST_BUDGET", "55"))
+
+# Concurrent calls to each sub-agent during a batch, and how many times a
+# sub-query is retried after the agent says it is busy
+BATCH_CONCURRENCY = int(os.getenv("HOST_BATCH_CONCURRENCY", "8"))
+BATCH_BUSY_RETRIES = int(os.getenv("HOST_BATCH_BUSY_RETRIES", "3"))
+
+SECTIONS = {
+    "flights": (FLIGHT_URL, "No flights returned."),
+    "stays": (STAY_URL, "No stays returned."),
+    "activities": (ACTIVITIES_URL, "No activities returned."),
+}
+
+# Each section is also the skill id its agent publishes in its card
+balancer = Balancer(
+    None,
+    {name: url for name, (url, _) in SECTIONS.items()},
+    open_registry=registry_from_env,
+)
+hedgers = Hedgers(SECTIONS)
 
-async def run(payload):
-    # Print what the host agent is sending
-    print("Incoming payload:", payload)
 
-    print("Calling flight agent...")
-    flights = await call_agent(FLIGHT_URL, payload)
-    print("Flight agent response received")
+def _section_timeout(section, deadline):
+    # Time out at whichever comes first: the agent deadline or the request budget
+    return max(0.0, min(AGENT_TIMEOUTS[section], deadline - time.monotonic()))
+
+
+def _section_result(section, result, started):
+    elapsed = round(time.monotonic() - started, 3)
+    logger.info(
+        "%s agent response received in %ss",
+        section,
+        elapsed,
+        extra={"section": section, "elapsed": elapsed},
+    )
+    if not isinstance(result, dict) or section not in result:
+        return None, {"state": "empty", "elapsed": elapsed}
+    return result[section], {"state": "ok", "elapsed": elapsed}
+
+
+def _section_failure(section, error, timeout, started):
+    if isinstance(error, AgentBusy):
+        # The agent is shedding load; report it rather than queueing more work
+        logger.warning(
+            "%s agent busy, retry after %.1fs",
+            section,
+            error.retry_after,
+            extra={"section": section, "retry_after": error.retry_after},
+        )
+        return None, {
+            "state": "busy",
+            "retry_after": round(error.retry_after, 3),
+            "elapsed": round(time.monotonic() - started, 3),
+        }
+    if isinstance(error, TimeoutError):
+        logger.warning(
+            "%s agent timed out after %.1fs",
+            section,
+            timeout,
+            extra={"section": section, "timeout": timeout},
+        )
+        return None, {"state": "timeout", "elapsed": round(timeout, 3)}
+    logger.warning(
+        "%s agent failed: %s",
+        section,
+        error,
+        extra={"section": section, "error": str(error)},
+    )
+    return None, {
+        "state": "error",
+        "error": str(error),
+        "elapsed": round(time.monotonic() - started, 3),
+    }
 
-    print("Calling stay agent...")
+
+async def _call_section(section, payload, deadline, hedge=True):
+    timeout = _section_timeout(section, deadline)
+    started = time.monotonic()
+    tried = []
+
+    async def attempt(n):
+        # A hedge goes to another replica when there is one, and only gets what
+        # is left of the section's time
+        error = None
+        while True:
+            remaining = started + timeout - time.monotonic()
+            if remaining <= 0:
+                # Nothing left to send a hedge or a failover with; not held
+                # against any replica
+                raise TimeoutError(f"No time left for {section}")
+            replica = await balancer.pick(section, exclude=tried)
+            if error is not None and replica.url in tried:
+                raise error
+            if n > 0 and replica.url in tried:
+                # A lone replica would only get the same call twice
+                raise SkipHedge(section)
+            tried.append(replica.url)
+            try:
+                async with replica.track():
+                    return await call_agent(
+                        f"{replica.url}/run",
+                        payload,
+                        idempotent=True,
+                        timeout=remaining,
+                    )
+            except Exception as e:
+                # A replica that looks down hands the call on to another one
+                if not unhealthy(e):
+                    raise
+                error = e
+
+    if timeout <= 0:
+        return _section_failure(section, TimeoutError(), timeout, started)
     try:
-        stay = await call_agent(STAY_URL, payload)
-        print("Stay agent response received")
+        call = hedgers[section].run(attempt) if hedge else attempt(0)
+        result = await asyncio.wait_for(call, timeout=timeout)
     except Exception as e:
-        print(f"Stay agent failed: {e}")
-        stay = {}
-
-    print("Calling activities agent...")
-    activities = await call_agent(ACTIVITIES_URL, payload)
-    print("Activities agent response received")
-
-    # Log outputs
-    print("flights:", flights)
-    print("stay:", stay)
-    print("activities:", activities)
-
-    # Ensure all are dicts
-    flights = flights if isinstance(flights, dict) else {}
-    stay = stay if isinstance(stay, dict) else {}
-    activities = activities if isinstance(activities, dict) else {}
-
-    return {
-        "flights": flights.get("flights", "No flights returned."),
-        "stays": stay.get("stays", "No stays returned."),
-        "activities": activities.get("activities", "No activities returned."),
-    }
+        return _section_failure(section, e, timeout, started)
+    return _section_result(section, result, started)
+
+
+async def _stream_section(section, payload, deadline, queue):
+    timeout = _section_timeout(section, deadline)
+    started = time.monotonic()
+    try:
+        if timeout <= 0:
+            raise TimeoutError(f"No time left for {section}")
+        result = None
+        replica = await balancer.pick(section)
+        url = f"{replica.url}/stream"
+        async with asyncio.timeout(timeout), replica.track():
+            async for event in stream_agent(url, payload, timeout=timeout):
+                if event["type"] == "result":
+                    result = event["data"]
+                elif event["type"] == "error":
+                    raise RuntimeError(event.get("error"))
+                else:
+                    await queue.put(
+                        {"type": "progress", "section": section, "event": event}
+                    )
+        value, status = _section_result(section, result, started)
+    except Exception as e:
+        value, status = _section_failure(section, e, timeout, started)
+    await queue.put(
+        {
+            "type": "section",
+            "section": section,
+            "data": value if value is not None else SECTIONS[section][1],
+            "status": status,
+        }
+    )
+
+
+async def _response(names, results, payload):
+    response = {}
+    status = {}
+    for name, (value, section_status) in zip(names, results):
+        response[name] = value if value is not None else SECTIONS[name][1]
+        status[name] = section_status
+    # Complete trips within the budget, worked out here instead of by the model;
+    # in a thread, since long trips take tens of milliseconds
+    response["itineraries"] = await asyncio.to_thread(
+        trip_itineraries, response, payload
+    )
+    response["status"] = status
+    return response
+
+
+async def run(payload):
+    logger.info("Incoming payload", extra={"payload": payload})
+
+    deadline = time.monotonic() + REQUEST_BUDGET
+    names = list(SECTIONS)
+    # Dispatch all sub-agents at once so latency tracks the slowest one
+    results = await asyncio.gather(
+        *(_call_section(name, payload, deadline) for name in names)
+    )
+    return await _response(names, results, payload)
+
+
+async def stream(payload):
+    """Yield each section as its sub-agent finishes, then itineraries and a summary."""
+    logger.info("Incoming streaming payload", extra={"payload": payload})
+
+    deadline = time.monotonic() + REQUEST_BUDGET
+    queue = asyncio.Queue()
+    tasks = [
+        asyncio.create_task(_stream_section(name, payload, deadline, queue))
+        for name in SECTIONS
+    ]
+    status = {}
+    sections = {}
+    try:
+        while len(status) < len(tasks):
+            event = await queue.get()
+            if event["type"] == "section":
+                status[event["section"]] = event["status"]
+                sections[event["section"]] = event["data"]
+            yield event
+        itineraries = await asyncio.to_thread(trip_itineraries, sections, payload)
+        yield {"type": "itineraries", "data": itineraries}
+        yield {"type": "done", "status": status}
+    finally:
+        # Stop sub-agent streams if the client went away early
+        for task in tasks:
+            task.cancel()
+
+
+async def _batch_section(section, payload, limit):
+    for attempt in range(BATCH_BUSY_RETRIES + 1):
+        async with limit:
+            deadline = time.monotonic() + REQUEST_BUDGET
+            # Batches are not hedged: they care about throughput, not the tail
+            value, status = await _call_section(section, payload, deadline, hedge=False)
+        if status["state"] != "busy" or attempt == BATCH_BUSY_RETRIES:
+            return value, status
+        # Wait out the agent's Retry-After without holding a slot
+        await asyncio.sleep(status["retry_after"])
+
+
+def _item_state(status):
+    states = [section["state"] for section in status.values()]
+    if all(state == "ok" for state in states):
+        return "ok"
+    return "partial" if "ok" in states else "failed"
+
+
+async def run_batch(payloads):
+    """Plan many trips, yielding each one as soon as all its sections are in.
+
+    Sub-queries the sub-agents would answer alike (the same cache key) are
+    sent once and shared by every item that needs them.
+    """
+    logger.info(
+        "Incoming batch of %d requests", len(payloads), extra={"items": len(payloads)}
+    )
+
+    started = time.monotonic()
+    limits = {name: asyncio.Semaphore(BATCH_CONCURRENCY) for name in SECTIONS}
+    calls = {}
+
+    def sub_query(section, payload):
+        # Keyed as the agent's own cache keys it
+        key = request_key(
+            payload,
+            section,
+            include_origin=section == "flights",
+            budget_band=BUDGET_BAND if section == "activities" else 0,
+        )
+        if key is None:
+            # Not cacheable, e.g. a NaN budget: not shared with any other item
+            return asyncio.create_task(
+                _batch_section(section, payload, limits[section])
+            )
+        if key not in calls:
+            calls[key] = asyncio.create_task(
+                _batch_section(section, payload, limits[section])
+            )
+        return calls[key]
+
+    async def item(index, payload):
+        try:
+            TravelRequest.model_validate(payload)
+        except ValidationError as e:
+            return {
+                "type": "item",
+                "index": index,
+                "status": "invalid",
+                "error": str(e),
+            }
+        names = list(SECTIONS)
+        results = await asyncio.gather(*(sub_query(name, payload) for name in names))
+        response = await _response(names, results, payload)
+        return {
+            "type": "item",
+            "index": index,
+            "status": _item_state(response["status"]),
+            "result": response,
+        }
+
+    tasks = [asyncio.create_task(item(i, p)) for i, p in enumerate(payloads)]
+    counts = {}
+    try:
+        for next_item in asyncio.as_completed(tasks):
+            event = await next_item
+            counts[event["status"]] = counts.get(event["status"], 0) + 1
+            yield event
+        valid = len(payloads) - counts.get("invalid", 0)
+        yield {
+            "type": "done",
+            "items": len(payloads),
+            "status": counts,
+            "sub_queries": len(calls),
+            "deduplicated": valid * len(SECTIONS) - len(calls),
+            "elapsed": round(time.monotonic() - started, 3),
+        }
+    finally:
+        # Stop outstanding work if the client went away early
+        for task in [*tasks, *calls.values()]:
+            task.cancel()
@@ -1,24 +1,28 @@
-import json
-import os
-
+from common.direct import (
+    DIRECT_TOOLS,
+    PREWARM_REQUEST,
+    run_direct,
+    structured_request,
+)
+from common.gateway_llm import gateway_llm
+from common.mcp_pool import travel_toolset
+from common.parsing import SectionParser
+from common.sessions import SessionManager, session_service_from_env
+from common.streaming import run_events
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
 from google.genai import types
+from shared.schemas import StayOption
 
 load_dotenv()
 
-# Get the absolute path to the MCP server
-MCP_SERVER_PATH = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..", "..", "mcp", "server.py")
-)
+# Only expose the stays tool
+toolset = travel_toolset(["get_stays"])
 
 stays_agent = Agent(
     name="stay_agent",
-    model=LiteLlm("openai/gpt-4o"),
+    model=gateway_llm(),
     description="Suggests stays for the user using real accommodation data tools",
     instruction=(
         "You are a accommodation specialist agent. Use the get_stays tool to find real accommodation options "
@@ -27,18 +31,10 @@ stays_agent = Agent(
         'formatted as: {"stays": [stay_objects]}. Do not use single quotes or Python dict syntax. '
         "Do not add any explanatory text or commentary."
     ),
-    tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command="python3",
-                args=[MCP_SERVER_PATH],
-            ),
-            tool_filter=["get_stays"],  # Only expose the stays tool
-        )
-    ],
+    tools=[toolset],
 )
 
-session_service = InMemorySessionService()
+session_service = session_service_from_env("stays")
 
 runner = Runner(
     agent=stays_agent,
@@ -49,23 +45,45 @@ runner = Runner(
 USER_ID = "user_stays"
 SESSION_ID = "session_stays"
 
+sessions = SessionManager(
+    session_service, app_name="stays_app", user_id=USER_ID, prefix=SESSION_ID
+)
+
+parse_response = SectionParser("stays", StayOption)
+
+
+async def _direct(request):
+    # Structured requests map straight onto get_stays, without a model round-trip
+    travel = structured_request(request, places=("destination",))
+    if travel is None:
+        return None
+    args = {
+        "destination": travel.destination,
+        "check_in": travel.start_date,
+        "check_out": travel.end_date,
+        "budget": travel.budget,
+    }
+    return await run_direct(toolset, "get_stays", args, parse_response)
+
+
+async def prewarm():
+    # One dummy tool call, so the first request finds the MCP servers warm
+    await _direct(PREWARM_REQUEST)
+
 
 async def execute(request):
-    # Create a unique session for each request
-    import uuid
-
-    unique_session_id = f"{SESSION_ID}_{uuid.uuid4().hex[:8]}"
-    try:
-        await session_service.create_session(
-            app_name="stays_app",
-            user_id=USER_ID,
-            session_id=unique_session_id,
-        )
-    except Exception as e:
-        print(f"Session creation failed: {e}")
+    if DIRECT_TOOLS:
+        result = await _direct(request)
+        if result is not None:
+            return result
+    # Each request gets its own session, released as soon as the run ends
+    async with sessions.session() as session_id:
+        return await _run(request, session_id)
+
 
+def _prompt(request):
     # Create a prompt that instructs the agent to use the MCP tool
-    prompt = (
+    return (
         f"Find accommodation options in {request['destination']} "
         f"for check-in on {request['start_date']} and check-out on {request['end_date']} "
         f"with a budget of ${request['budget']}. "
@@ -77,61 +95,28 @@ async def execute(request):
         f"Do not include any explanatory text, just the JSON data with double quotes."
     )
 
-    message = types.Content(role="user", parts=[types.Part(text=prompt)])
+
+async def _run(request, session_id):
+    message = types.Content(role="user", parts=[types.Part(text=_prompt(request))])
+    result = None
+    # Read the run to its end, so ADK closes its spans before the request ends
     async for event in runner.run_async(
-        user_id=USER_ID, session_id=unique_session_id, new_message=message
+        user_id=USER_ID, session_id=session_id, new_message=message
     ):
         if event.is_final_response():
-            response_text = event.content.parts[0].text
-            print(f"Stay agent raw response: {response_text}")
-
-            try:
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = (
-                        response_text.replace("```json", "").replace("```", "").strip()
-                    )
-                elif response_text.startswith("```"):
-                    response_text = response_text.replace("```", "").strip()
-
-                # Fix single quotes to double quotes for JSON parsing
-                response_text = response_text.replace("'", '"')
-
-                # Try to parse as JSON first
-                parsed = json.loads(response_text)
-                if "stays" in parsed and isinstance(parsed["stays"], list):
-                    print(f"Returning parsed stays: {len(parsed['stays'])} items")
-                    return {"stays": parsed["stays"]}
-                else:
-                    print("`stays` key missing or not a list in response JSON.")
-                    # Fallback: try to extract JSON from the response
-                    import re
-
-                    json_match = re.search(r"\[.*\]", response_text, re.DOTALL)
-                    if json_match:
-                        stays_array = json.loads(json_match.group())
-                        print(f"Extracted stays array: {len(stays_array)} items")
-                        return {"stays": stays_array}
-                    return {"stays": []}  # Return empty array as fallback
-
-            except json.JSONDecodeError as e:
-                print("JSON parsing failed:", e)
-                print("Response content:", response_text)
-
-                # Try to extract JSON array from the response text
-                import re
-
-                json_match = re.search(r"\[.*\]", response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        # Fix single quotes in the extracted JSON
-                        json_text = json_match.group().replace("'", '"')
-                        stays_array = json.loads(json_text)
-                        print(
-                            f"Extracted stays array from text: {len(stays_array)} items"
-                        )
-                        return {"stays": stays_array}
-                    except:
-                        pass
-
-                return {"stays": []}  # Return empty array as final fallback
+            result = parse_response.parse_event(event)
+    return result
+
+
+async def stream(request):
+    # Same run as execute, but yielding tokens and tool calls as they happen
+    if DIRECT_TOOLS:
+        result = await _direct(request)
+        if result is not None:
+            yield {"type": "result", "data": result}
+            return
+    async with sessions.session() as session_id:
+        async for event in run_events(
+            runner, USER_ID, session_id, _prompt(request), parse_response
+        ):
+            yield event
@@ -1,4 +1,22 @@
+from common.cache import cache_from_env
+
 from .agent import execute
+from .agent import stream as agent_stream
+
+# get_stays filters by budget, so only the exact budget shares an answer
+cache = cache_from_env("stays", include_origin=False, budget_band=0)
+
 
 async def run(payload):
-    return await execute(payload)
\ No newline at end of file
+    return await cache.run(payload, execute)
+
+
+async def stream(payload):
+    cached = await cache.lookup(payload)
+    if cached is not None:
+        yield {"type": "result", "data": cached}
+        return
+    async for event in agent_stream(payload):
+        if event["type"] == "result":
+            await cache.store(payload, event["data"])
+        yield event
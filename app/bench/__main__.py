@@ -0,0 +1,209 @@
+"""
+Load test of the whole system, offline: the four agents and the fake model run
+as local subprocesses and the host's /run is driven at a fixed concurrency.
+
+    cd app && uv run python -m bench --concurrency 16 --requests 400
+    cd app && uv run python -m bench --replay trips.jsonl --baseline bench/baseline.json
+
+Exits with status 1 when a result is worse than the baseline by more than the
+tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+from bench.harness import (
+    SERVICES,
+    compare,
+    drive,
+    machine,
+    read_requests,
+    request_mix,
+    running,
+    stage_breakdown,
+    summarize,
+)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _arguments():
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=16)
+    parser.add_argument(
+        "--endpoint", default="/run", help="Host endpoint to drive (default /run)"
+    )
+    parser.add_argument(
+        "--priority", default="default", help="X-A2A-Priority of every request"
+    )
+    mix = parser.add_argument_group("request mix")
+    mix.add_argument(
+        "--replay", help="JSONL file of travel requests to send instead, in order"
+    )
+    mix.add_argument(
+        "--distinct", type=int, default=50, help="Different requests in the mix"
+    )
+    mix.add_argument(
+        "--free-form",
+        type=float,
+        default=0.2,
+        help="Share of requests with a free-form destination, which need the model",
+    )
+    mix.add_argument("--seed", type=int, default=0)
+    model = parser.add_argument_group("fake model")
+    model.add_argument("--llm-latency", type=float, default=0.5)
+    model.add_argument(
+        "--llm-dist",
+        default="lognormal",
+        choices=["fixed", "uniform", "lognormal", "exponential"],
+    )
+    model.add_argument("--llm-jitter", type=float, default=0.3)
+    model.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Extra setting for every service, e.g. A2A_CACHE_TTL=0",
+    )
+    parser.add_argument("--output", help="Write the full report to this JSON file")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const=BASELINE,
+        help=f"Compare with a saved report (default {BASELINE})",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        nargs="?",
+        const=BASELINE,
+        help="Save this report as the baseline",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args()
+
+
+def _settings(args) -> dict:
+    settings = {
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_LATENCY_DIST": args.llm_dist,
+        "FAKE_LLM_JITTER": str(args.llm_jitter),
+        "FAKE_LLM_RATE_LIMIT_RATE": str(args.llm_rate_limit_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+    }
+    for setting in args.env:
+        name, _, value = setting.partition("=")
+        settings[name] = value
+    return settings
+
+
+async def _bench(args) -> dict:
+    if args.replay:
+        payloads = read_requests(args.replay)
+    else:
+        payloads = request_mix(args.requests, args.distinct, args.free_form, args.seed)
+    settings = _settings(args)
+    url = f"http://127.0.0.1:{SERVICES['host'][1]}{args.endpoint}"
+    async with running(settings) as services:
+        # Not measured: first sessions, MCP tool lists and connections
+        warmup = request_mix(args.warmup, args.warmup, args.free_form, args.seed + 1)
+        await drive(url, warmup, args.concurrency, args.priority)
+        async with httpx.AsyncClient(timeout=10) as client:
+            metrics_before = await services.metrics(client)
+            memory_before = services.memory()
+            started = time.perf_counter()
+            results = await drive(url, payloads, args.concurrency, args.priority)
+            elapsed = time.perf_counter() - started
+            metrics_after = await services.metrics(client)
+            memory_after = services.memory()
+
+    report = {
+        "config": {
+            "concurrency": args.concurrency,
+            "endpoint": args.endpoint,
+            "replay": args.replay,
+            "distinct": None if args.replay else args.distinct,
+            "free_form": None if args.replay else args.free_form,
+            "settings": settings,
+        },
+        # Timings are only comparable with a baseline from similar hardware
+        "machine": machine(),
+        **summarize(results, elapsed),
+        "memory_mb": {},
+        "stages": {},
+    }
+    for name in SERVICES:
+        before, after = memory_before[name], memory_after[name]
+        report["memory_mb"][name] = {
+            "before": before,
+            "after": after,
+            "growth": None if before is None else round(after - before, 1),
+        }
+        report["stages"][name] = stage_breakdown(
+            metrics_before[name], metrics_after[name]
+        )
+    return report
+
+
+def _print(report: dict):
+    latency = report["latency_ms"]
+    print(
+        f"{report['requests']} requests in {report['seconds']}s: "
+        f"{report['throughput_rps']} req/s, error rate {report['error_rate']}"
+    )
+    print(
+        f"latency ms  p50 {latency['p50']}  p95 {latency['p95']}  "
+        f"p99 {latency['p99']}  max {latency['max']}"
+    )
+    print(f"statuses    {report['statuses']}")
+    for name, states in report["sections"].items():
+        print(f"  {name:<11} {states}")
+    for name, memory in report["memory_mb"].items():
+        print(
+            f"{name:<11} rss {memory['before']} -> {memory['after']} MB"
+            f" ({memory['growth']:+})"
+            if memory["growth"] is not None
+            else f"{name:<11} rss unavailable"
+        )
+        for stage, timing in report["stages"][name].items():
+            print(f"  {stage:<40} {timing['calls']:>6}x {timing['mean_ms']:>9} ms")
+
+
+def main():
+    args = _arguments()
+    report = asyncio.run(_bench(args))
+    _print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != report["config"]:
+            print("NOTE the baseline was run with different settings")
+        if baseline.get("machine") != report["machine"]:
+            print(
+                "NOTE the baseline was recorded on another machine "
+                f"({baseline.get('machine')}); its timings may differ by more "
+                f"than the {args.tolerance:.0%} tolerance, so save a baseline "
+                "on this one first"
+            )
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_LLM_PORT = 8900
+# Module and port of every service; the host calls the others on these ports
+SERVICES = {
+    "flight": ("agents.flight_agent", 8001),
+    "stay": ("agents.stay_agent", 8002),
+    "activities": ("agents.activities_agent", 8003),
+    "host": ("agents.host_agent", 8000),
+}
+
+CITIES = [
+    "Paris",
+    "London",
+    "Tokyo",
+    "New York",
+    "Rome",
+    "Barcelona",
+    "Lisbon",
+    "Berlin",
+    "Amsterdam",
+    "Sydney",
+]
+
+# Summary fields compared against a baseline, and whether higher is better
+COMPARED = {
+    "throughput_rps": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "error_rate": False,
+}
+
+_SAMPLE = re.compile(r"^(\w+)\{(.*)\} (\S+)$")
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def request_mix(count: int, distinct: int, free_form: float, seed: int) -> List[Dict]:
+    """``count`` travel requests drawn from a fixed pool of ``distinct`` ones.
+
+    A ``free_form`` share of the pool has a sentence for a destination, which
+    the flight and stay agents hand to the model instead of calling the tool.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        origin, destination = rng.sample(CITIES, 2)
+        start = rng.randrange(1, 25)
+        payload = {
+            "origin": origin,
+            "destination": destination,
+            "start_date": f"2025-07-{start:02d}",
+            "end_date": f"2025-07-{start + rng.randrange(2, 7):02d}",
+            "budget": rng.randrange(5, 40) * 100,
+        }
+        if rng.random() < free_form:
+            payload["destination"] = f"somewhere near {destination} with good food"
+        pool.append(payload)
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def read_requests(path: str) -> List[Dict]:
+    """Travel requests from a JSONL file, one per line, as /run_batch takes them."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _rss_kb(pid: int) -> int:
+    # Resident memory of a process and its children (workers, MCP servers)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(
+                (int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0
+            )
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return 0
+    return rss + sum(_rss_kb(child) for child in children)
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Memory of a service's process tree in MB, or None off Linux."""
+    if not os.path.exists("/proc"):
+        return None
+    return round(_rss_kb(pid) / 1024, 1)
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple], float]:
+    """Samples of a Prometheus text page, keyed by name and sorted labels."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            key = (name, tuple(sorted(_LABEL.findall(labels))))
+            samples[key] = float(value)
+    return samples
+
+
+def stage_breakdown(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    """Calls and mean milliseconds per stage between two scrapes of one service."""
+    stages = {}
+    for (name, labels), count in after.items():
+        if name != "a2a_stage_seconds_count":
+            continue
+        calls = count - before.get((name, labels), 0)
+        if calls <= 0:
+            continue
+        total = after[("a2a_stage_seconds_sum", labels)] - before.get(
+            ("a2a_stage_seconds_sum", labels), 0
+        )
+        stage = dict(labels)["stage"]
+        stages[stage] = {
+            "calls": int(calls),
+            "mean_ms": round(total / calls * 1000, 2),
+        }
+    return dict(sorted(stages.items(), key=lambda item: -item[1]["mean_ms"]))
+
+
+def check_ports(*ports: int):
+    for port in ports:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=0.5)
+        except httpx.TransportError:
+            continue
+        raise RuntimeError(f"Port {port} is already in use")
+
+
+class Services:
+    """The fake model and the four agents, each in its own subprocess."""
+
+    def __init__(self, env: Dict[str, str], log_dir: str):
+        self.env = env
+        self.log_dir = log_dir
+        self.processes: Dict[str, subprocess.Popen] = {}
+
+    def _spawn(self, name: str, module: str):
+        log = open(os.path.join(self.log_dir, f"{name}.log"), "w")
+        self.processes[name] = subprocess.Popen(
+            [sys.executable, "-m", module],
+            cwd=APP_DIR,
+            env=self.env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+    async def _wait(self, client: httpx.AsyncClient, name: str, url: str, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.processes[name].poll() is not None:
+                break
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(
+            f"{name} did not become ready, see {self.log_dir}/{name}.log"
+        )
+
+    async def start(self, timeout: float):
+        check_ports(FAKE_LLM_PORT, *(port for _, port in SERVICES.values()))
+        self._spawn("fake_llm", "common.fake_llm")
+        for name, (module, _) in SERVICES.items():
+            self._spawn(name, module)
+        async with httpx.AsyncClient(timeout=5) as client:
+            await self._wait(
+                client, "fake_llm", f"http://127.0.0.1:{FAKE_LLM_PORT}/healthz", timeout
+            )
+            for name, (_, port) in SERVICES.items():
+                await self._wait(
+                    client, name, f"http://127.0.0.1:{port}/readyz", timeout
+                )
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def memory(self) -> Dict[str, Optional[float]]:
+        return {name: rss_mb(self.processes[name].pid) for name in SERVICES}
+
+    async def metrics(self, client: httpx.AsyncClient) -> Dict[str, Dict]:
+        pages = await asyncio.gather(
+            *(
+                client.get(f"http://127.0.0.1:{port}/metrics")
+                for _, port in SERVICES.values()
+            )
+        )
+        return {name: parse_metrics(page.text) for name, page in zip(SERVICES, pages)}
+
+
+def service_env(overrides: Dict[str, str], log_dir: str) -> Dict[str, str]:
+    """Environment for services that run offline against the fake model."""
+    return {
+        **os.environ,
+        "LLM_API_BASE": f"http://127.0.0.1:{FAKE_LLM_PORT}/v1",
+        "OPENAI_API_KEY": "fake",
+        # Use LiteLLM's bundled model prices instead of downloading them
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        "A2A_CACHE_DIR": os.path.join(log_dir, "cache"),
+        "A2A_LOG_LEVEL": "WARNING",
+        # So the logs are complete when a service fails to start
+        "PYTHONUNBUFFERED": "1",
+        **overrides,
+    }
+
+
+@asynccontextmanager
+async def running(overrides: Dict[str, str], startup_timeout: float = 300):
+    """Start every service offline against the fake model; yield them."""
+    log_dir = tempfile.mkdtemp(prefix="a2a-bench-")
+    services = Services(service_env(overrides, log_dir), log_dir)
+    try:
+        await services.start(startup_timeout)
+        yield services
+    finally:
+        services.stop()
+
+
+async def drive(
+    url: str, payloads: List[Dict], concurrency: int, priority: str = "default"
+) -> List[Dict[str, Any]]:
+    """Send every payload with ``concurrency`` requests in flight at a time."""
+    results: List[Dict[str, Any]] = []
+    queue = iter(payloads)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        for payload in queue:
+            started = time.perf_counter()
+            result: Dict[str, Any] = {}
+            try:
+                response = await client.post(
+                    url, json=payload, headers={"X-A2A-Priority": priority}
+                )
+                result["status"] = response.status_code
+                if response.status_code == 200:
+                    result["sections"] = {
+                        name: section["state"]
+                        for name, section in response.json().get("status", {}).items()
+                    }
+            except httpx.HTTPError as e:
+                result["status"] = type(e).__name__
+            result["seconds"] = time.perf_counter() - started
+            results.append(result)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return results
+
+
+def machine() -> Dict[str, Any]:
+    """What a report's absolute timings depend on besides the code."""
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+    # Nearest rank, so that any number of results has one
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return round(ordered[rank - 1], 1)
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(result["seconds"] * 1000 for result in results)
+    statuses: Dict[str, int] = {}
+    sections: Dict[str, Dict[str, int]] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+        for name, state in result.get("sections", {}).items():
+            counts = sections.setdefault(name, {})
+            counts[state] = counts.get(state, 0) + 1
+    failed = sum(
+        1
+        for result in results
+        if result["status"] != 200
+        or any(state != "ok" for state in result.get("sections", {}).values())
+    )
+    return {
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "mean": round(statistics.fmean(latencies), 1) if latencies else None,
+            "max": _percentile(latencies, 100),
+        },
+        "error_rate": round(failed / len(results), 4) if results else 0.0,
+        "statuses": statuses,
+        "sections": sections,
+    }
+
+
+def _field(summary: Dict[str, Any], path: str) -> float:
+    value: Any = summary
+    for key in path.split("."):
+        value = value[key]
+    return value
+
+
+def compare(
+    summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Fields that got worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    for path, higher_is_better in COMPARED.items():
+        now, then = _field(summary, path), _field(baseline, path)
+        if now is None or then is None:
+            # A run with no requests has no latencies to compare
+            continue
+        if path == "error_rate":
+            # A rate can start at zero, so compare it in absolute terms
+            worse = now - then > tolerance / 10
+        elif higher_is_better:
+            worse = now < then * (1 - tolerance)
+        else:
+            worse = now > then * (1 + tolerance)
+        if worse:
+            regressions.append(f"{path}: {then} -> {now}")
+    return regressions
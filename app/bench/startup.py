@@ -0,0 +1,135 @@
+"""
+Cold start of each agent service: how long until it listens and until it is
+ready, and which imports the time goes to before and after it listens.
+
+    cd app && uv run python -m bench.startup
+    cd app && uv run python -m bench.startup --services flight stay --prewarm
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+from bench.harness import APP_DIR, SERVICES, check_ports, service_env
+
+# python -X importtime: "import time: self | cumulative | name", microseconds,
+# with the name indented two spaces per level of nesting
+_IMPORT = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \| \s*(\S+)$")
+# Logged by uvicorn once the server accepts connections
+_LISTENING = "Uvicorn running on"
+
+
+def import_breakdown(lines: List[str], top: int) -> Dict[str, Any]:
+    """Seconds spent importing each package, before and after listening."""
+    phases: Dict[str, Dict[str, float]] = {"before": {}, "after": {}}
+    phase = phases["before"]
+    for line in lines:
+        if _LISTENING in line:
+            phase = phases["after"]
+            continue
+        match = _IMPORT.match(line)
+        if match:
+            # Each module's own time, so nested imports count for their package
+            package = match.group(2).split(".")[0]
+            phase[package] = phase.get(package, 0.0) + int(match.group(1)) / 1e6
+    report = {}
+    for name, packages in phases.items():
+        ranked = sorted(packages.items(), key=lambda item: -item[1])
+        report[name] = {
+            "seconds": round(sum(packages.values()), 3),
+            "packages": {package: round(s, 3) for package, s in ranked[:top]},
+        }
+    return report
+
+
+async def _poll(client: httpx.AsyncClient, url: str, process, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            response = await client.get(url)
+            if response.status_code == 200:
+                return response.json()
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.02)
+    raise RuntimeError(f"{url} did not answer 200")
+
+
+async def measure(name: str, env: Dict[str, str], log_dir: str, top: int):
+    module, port = SERVICES[name]
+    log = os.path.join(log_dir, f"{name}.log")
+    with open(log, "w") as output:
+        started = time.monotonic()
+        process = subprocess.Popen(
+            [sys.executable, "-X", "importtime", "-m", module],
+            cwd=APP_DIR,
+            env=env,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+        try:
+            async with httpx.AsyncClient(timeout=1) as client:
+                base = f"http://127.0.0.1:{port}"
+                await _poll(client, f"{base}/healthz", process, 300)
+                listening = time.monotonic() - started
+                ready = await _poll(client, f"{base}/readyz", process, 300)
+                ready_after = time.monotonic() - started
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    with open(log) as f:
+        imports = import_breakdown(f.read().splitlines(), top)
+    return {
+        "listening_seconds": round(listening, 3),
+        "ready_seconds": round(ready_after, 3),
+        "steps": ready.get("startup", {}),
+        "imports": imports,
+    }
+
+
+async def _main(args) -> Dict[str, Any]:
+    check_ports(*(SERVICES[name][1] for name in args.services))
+    log_dir = tempfile.mkdtemp(prefix="a2a-startup-")
+    env = service_env({"A2A_PREWARM": "1" if args.prewarm else "0"}, log_dir)
+    report = {}
+    # One at a time, so they do not compete for the CPU
+    for name in args.services:
+        report[name] = await measure(name, env, log_dir, args.top)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.startup")
+    parser.add_argument(
+        "--services", nargs="+", choices=list(SERVICES), default=list(SERVICES)
+    )
+    parser.add_argument("--prewarm", action="store_true", help="Set A2A_PREWARM=1")
+    parser.add_argument("--top", type=int, default=8, help="Packages listed per phase")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+    report = asyncio.run(_main(args))
+    for name, result in report.items():
+        steps = ", ".join(f"{step} {s}s" for step, s in result["steps"].items())
+        print(
+            f"{name}: listening after {result['listening_seconds']}s, "
+            f"ready after {result['ready_seconds']}s ({steps})"
+        )
+        for phase, imports in result["imports"].items():
+            print(f"  imports {phase} listening: {imports['seconds']}s")
+            for package, seconds in imports["packages"].items():
+                print(f"    {package:<32} {seconds:>7}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
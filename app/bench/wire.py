@@ -0,0 +1,139 @@
+"""
+Encode and decode time and body size of each /run encoding, against the JSON
+path agents use today (FastAPI's response rendering, then ``response.json()``
+in the caller). Offline: the bodies are built and read back in process.
+
+    cd app && uv run python -m bench.wire
+    cd app && uv run python -m bench.wire --sizes 100 10000 --repeat 50
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+from agents.host_agent.itinerary import plan_itineraries
+from common.a2a_server import DefaultResponse
+from common.wire import ARROW, JSON, MSGPACK, available, decode, encode
+from fastapi.encoders import jsonable_encoder
+
+WORDS = "scenic direct quiet central family budget luxury historic modern cosy"
+
+
+def options(count: int, rng: random.Random, **extra) -> List[Dict[str, Any]]:
+    """``count`` options shaped like the agents' validated answers."""
+    words = WORDS.split()
+    return [
+        {
+            "name": f"Option {i}",
+            "description": " ".join(rng.choices(words, k=8)),
+            "price_estimate": round(rng.uniform(20, 900), 2),
+            "duration_hours": round(rng.uniform(1, 12), 1),
+            **{key: make(rng) for key, make in extra.items()},
+        }
+        for i in range(count)
+    ]
+
+
+def host_answer(count: int, seed: int = 0) -> Dict[str, Any]:
+    """A host /run answer with ``count`` options in each section."""
+    rng = random.Random(seed)
+    flights = options(count, rng, airline=lambda r: r.choice(["AF", "BA", "LH"]))
+    stays = options(count, rng, nights=lambda r: r.randint(1, 7))
+    activities = options(count, rng)
+    return {
+        "flights": flights,
+        "stays": stays,
+        "activities": activities,
+        "itineraries": plan_itineraries(flights, stays, activities, 2500.0, days=3),
+        "status": {
+            name: {"state": "ok", "elapsed": 1.2}
+            for name in ("flights", "stays", "activities")
+        },
+    }
+
+
+def _json_body(value: Any) -> bytes:
+    # What FastAPI does with a /run result before it is sent
+    return DefaultResponse(jsonable_encoder(value)).body
+
+
+def _json_read(body: bytes) -> Any:
+    return httpx.Response(200, content=body, headers={"content-type": JSON}).json()
+
+
+def _encodings() -> Dict[str, tuple]:
+    encodings = {"json (current)": (_json_body, _json_read)}
+    binary = [
+        ("msgpack", MSGPACK, {}),
+        ("arrow", ARROW, {}),
+        ("arrow+zstd", ARROW, {"compression": "zstd"}),
+        ("arrow+lz4", ARROW, {"compression": "lz4"}),
+    ]
+    for name, media_type, params in binary:
+        if available(media_type):
+            encodings[name] = (
+                lambda value, m=media_type, p=params: encode(value, m, p),
+                lambda body, m=media_type: decode(body, m),
+            )
+    return encodings
+
+
+def _median_ms(call: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started)
+    return round(statistics.median(times) * 1000, 3)
+
+
+def measure(value: Any, repeat: int) -> Dict[str, Dict[str, float]]:
+    report = {}
+    for name, (write, read) in _encodings().items():
+        body = write(value)
+        if read(body) != value:
+            raise AssertionError(f"{name} does not read back what was written")
+        report[name] = {
+            "bytes": len(body),
+            "encode_ms": _median_ms(lambda: write(value), repeat),
+            "decode_ms": _median_ms(lambda: read(body), repeat),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.wire", description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+        help="Options per section of the answer",
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per median")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    for size in args.sizes:
+        results = report[str(size)] = measure(host_answer(size), args.repeat)
+        baseline = results["json (current)"]
+        print(f"{size} options per section")
+        print(f"  {'encoding':<16}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+        for name, result in results.items():
+            share = result["bytes"] / baseline["bytes"]
+            print(
+                f"  {name:<16}{result['bytes']:>12}{result['encode_ms']:>12}"
+                f"{result['decode_ms']:>12}   {share:.0%} of JSON"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,221 @@
-from typing import Any, Dict
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+from urllib.parse import urlsplit
 
 import httpx
+from common.admission import PRIORITY_HEADER, TIMEOUT_HEADER, current_priority
+from common.telemetry import get_logger, inject_trace, tracer
+from common.wire import accept, decode
+from opentelemetry import trace
 
+# Connection pool settings, shared by every per-agent client
+MAX_CONNECTIONS = int(os.getenv("A2A_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("A2A_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("A2A_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("A2A_HTTP2", "0") == "1"
+TIMEOUT = httpx.Timeout(
+    float(os.getenv("A2A_TIMEOUT", "60")),
+    connect=float(os.getenv("A2A_CONNECT_TIMEOUT", "5")),
+)
 
-async def call_agent(url: str, payload: Dict[str, Any]):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, timeout=60.0)
+# Retries only apply to calls the caller marks as idempotent
+MAX_RETRIES = int(os.getenv("A2A_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("A2A_BACKOFF_BASE", "0.2"))
+BACKOFF_MAX = float(os.getenv("A2A_BACKOFF_MAX", "2.0"))
+RETRYABLE_STATUS = {502, 504}
+
+# 429/503 mean the agent is shedding load: wait out its Retry-After when that
+# fits the caller's budget, otherwise fail fast instead of piling on
+BUSY_STATUS = {429, 503}
+MAX_BUSY_WAIT = float(os.getenv("A2A_MAX_BUSY_WAIT", "5"))
+
+logger = get_logger(__name__)
+
+# Accept header of /run calls, asking for A2A_WIRE_FORMAT
+RUN_ACCEPT = accept()
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+# Origin -> monotonic time before which the agent asked not to be called
+_busy_until: Dict[str, float] = {}
+
+
+class AgentBusy(Exception):
+    def __init__(self, url: str, retry_after: float):
+        super().__init__(f"{url} is busy, retry after {retry_after:.1f}s")
+        self.url = url
+        self.retry_after = retry_after
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _http2_enabled() -> bool:
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("A2A_HTTP2 is set but the h2 package is missing, using HTTP/1.1")
+        return False
+    return True
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_enabled(),
+        timeout=TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """Return the long-lived client for the agent serving ``url``."""
+    origin = _origin(url)
+    client = _clients.get(origin)
+    if client is None or client.is_closed:
+        client = _clients[origin] = _new_client()
+    return client
+
+
+async def startup(urls: Iterable[str] = ()):
+    for url in urls:
+        get_client(url)
+
+
+async def shutdown():
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients))
+
+
+def _headers(
+    timeout: Optional[float], span: Optional[trace.Span] = None
+) -> Dict[str, str]:
+    headers = {PRIORITY_HEADER: current_priority.get()}
+    if timeout is not None:
+        headers[TIMEOUT_HEADER] = f"{timeout:.3f}"
+    # The called agent continues this trace
+    inject_trace(headers, span)
+    return headers
+
+
+def _mark_busy(url: str, response: httpx.Response) -> float:
+    try:
+        retry_after = float(response.headers.get("Retry-After", "1"))
+    except ValueError:
+        retry_after = 1.0
+    origin = _origin(url)
+    _busy_until[origin] = max(
+        _busy_until.get(origin, 0.0), time.monotonic() + retry_after
+    )
+    return retry_after
+
+
+def is_busy(url: str) -> bool:
+    """Whether the agent serving ``url`` asked not to be called for now."""
+    return _busy_until.get(_origin(url), 0.0) > time.monotonic()
+
+
+async def _wait_if_busy(url: str, deadline: Optional[float], can_wait: bool):
+    wait = _busy_until.get(_origin(url), 0.0) - time.monotonic()
+    if wait <= 0:
+        return
+    fits = deadline is None or time.monotonic() + wait < deadline
+    if not can_wait or wait > MAX_BUSY_WAIT or not fits:
+        raise AgentBusy(url, wait)
+    await asyncio.sleep(wait)
+
+
+async def _backoff(attempt: int):
+    # Full jitter keeps retrying callers from stampeding a recovering agent
+    await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)))
+
+
+async def call_agent(
+    url: str,
+    payload: Dict[str, Any],
+    *,
+    idempotent: bool = False,
+    timeout: Optional[float] = None,
+):
+    with tracer.start_as_current_span(
+        f"call_agent [{_origin(url)}]", kind=trace.SpanKind.CLIENT
+    ):
+        return await _call_agent(url, payload, idempotent, timeout)
+
+
+async def _call_agent(
+    url: str, payload: Dict[str, Any], idempotent: bool, timeout: Optional[float]
+):
+    client = get_client(url)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    attempts = 1 + (MAX_RETRIES if idempotent else 0)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        await _wait_if_busy(url, deadline, can_wait=idempotent)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            # Spent on earlier attempts and backoff, or gone before the call
+            raise TimeoutError(f"No time left to call {url}")
+        try:
+            response = await client.post(
+                url,
+                json=payload,
+                headers={**_headers(remaining), "Accept": RUN_ACCEPT},
+                timeout=TIMEOUT if remaining is None else remaining,
+            )
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+            await _backoff(attempt)
+            continue
+        if response.status_code in BUSY_STATUS:
+            retry_after = _mark_busy(url, response)
+            if last_attempt:
+                raise AgentBusy(url, retry_after)
+            continue
+        if response.status_code in RETRYABLE_STATUS and not last_attempt:
+            await _backoff(attempt)
+            continue
         response.raise_for_status()
-        return response.json()
+        return decode(response.content, response.headers.get("content-type", ""))
+
+
+async def stream_agent(
+    url: str, payload: Dict[str, Any], *, timeout: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the NDJSON events of an agent's /stream endpoint as they arrive."""
+    if timeout is not None and timeout <= 0:
+        raise TimeoutError(f"No time left to call {url}")
+    client = get_client(url)
+    await _wait_if_busy(url, None, can_wait=False)
+    # Not the current span: a generator's context does not survive its yields
+    span = tracer.start_span(
+        f"stream_agent [{_origin(url)}]", kind=trace.SpanKind.CLIENT
+    )
+    try:
+        async with client.stream(
+            "POST",
+            url,
+            json=payload,
+            headers=_headers(timeout, span),
+            timeout=TIMEOUT if timeout is None else timeout,
+        ) as response:
+            if response.status_code in BUSY_STATUS:
+                raise AgentBusy(url, _mark_busy(url, response))
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        span.end()
@@ -1,14 +1,375 @@
-from typing import Any, Dict
+import asyncio
+import importlib
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List
 
-from fastapi import FastAPI
-from google.adk.agents import Agent
+from common import a2a_client
+from common.admission import (
+    AdmissionController,
+    Rejected,
+    current_deadline,
+    current_priority,
+    request_options,
+)
+from common.llm_gateway import gateway
+from common.registry import load_card, registration_from_env
+from common.telemetry import (
+    TelemetryMiddleware,
+    get_logger,
+    render_metrics,
+    setup_telemetry,
+)
+from common.wire import JSON, encode, negotiate
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
 
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
 
-def create_app(agent: Agent):
-    app = FastAPI()
+# Largest number of requests accepted in one /run_batch call
+BATCH_MAX_ITEMS = int(os.getenv("A2A_BATCH_MAX_ITEMS", "10000"))
+
+# Run each agent's prewarm (a dummy tool call) before reporting ready
+PREWARM = os.getenv("A2A_PREWARM", "0") == "1"
+
+# Parts of an agent that may be given as "module:attribute" import paths
+_LAZY = (
+    "execute",
+    "stream",
+    "run_batch",
+    "cache",
+    "sessions",
+    "toolset",
+    "prewarm",
+    "hedging",
+    "balancer",
+)
+
+NDJSON = "application/x-ndjson"
+
+logger = get_logger(__name__)
+
+
+async def ndjson(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        # Headers are already sent, so report failures in-band
+        logger.exception("Stream failed")
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+
+async def _batch_payloads(request: Request) -> List[Any]:
+    """Read a JSON list (or ``{"requests": [...]}``) or JSONL request body."""
+    body = await request.body()
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        # Anything but application/json is read as one request per line
+        if media_type == "application/json":
+            payloads = json.loads(body)
+            if isinstance(payloads, dict):
+                payloads = payloads.get("requests")
+        else:
+            payloads = [json.loads(line) for line in body.splitlines() if line.strip()]
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid batch body: {e}")
+    if not isinstance(payloads, list):
+        raise HTTPException(400, "Expected a list of requests")
+    if len(payloads) > BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"At most {BATCH_MAX_ITEMS} requests per batch")
+    return payloads
+
+
+def _resolve(value: Any) -> Any:
+    # "module:attribute", as in uvicorn's app paths
+    if isinstance(value, str):
+        module, _, name = value.partition(":")
+        return getattr(importlib.import_module(module), name)
+    return value
+
+
+def create_app(agent: Any, peers: Iterable[str] = ()):
+    """Serve ``agent`` over A2A.
+
+    Parts of ``agent`` given as ``"module:attribute"`` strings are imported in
+    the background once the server is listening, so the heavy model and tool
+    libraries do not delay it: /healthz answers at once and /readyz once the
+    parts are loaded, started and (with ``A2A_PREWARM=1``) prewarmed.
+    """
+    declared = {name: getattr(agent, name, None) for name in _LAZY}
+    tasks = getattr(agent, "tasks", None)
+    # The agent's A2A card, or the path of its .well-known/agent.json
+    card = getattr(agent, "card", None)
+    if isinstance(card, str):
+        card = load_card(card)
+    admission = getattr(agent, "admission", None) or AdmissionController("agent")
+    setup_telemetry(admission.name)
+
+    parts: Dict[str, Any] = {}
+    # Background resources that have started, closed in reverse order
+    started: List[Any] = []
+    state: Dict[str, Any] = {"status": "starting", "startup": {}}
+
+    def load() -> Dict[str, Any]:
+        return {name: _resolve(value) for name, value in declared.items()}
+
+    async def boot():
+        began = [time.monotonic()]
+
+        def lap(step: str):
+            now = time.monotonic()
+            state["startup"][step] = round(now - began[0], 3)
+            began[0] = now
+
+        # The event loop keeps answering probes while the imports run
+        parts.update(await asyncio.to_thread(load))
+        lap("load")
+        if tasks is not None and tasks.execute is None:
+            tasks.execute = parts["execute"]
+        for resource in (parts["sessions"], parts["toolset"], parts["balancer"], tasks):
+            if resource is not None:
+                await resource.start()
+                started.append(resource)
+        lap("start")
+        if PREWARM and parts["prewarm"] is not None:
+            await parts["prewarm"]()
+            lap("prewarm")
+        state["status"] = "ready"
+        logger.info("Ready", extra={"startup": state["startup"]})
+        # Listed for callers only once it can answer them
+        registration = card and await asyncio.to_thread(registration_from_env, card)
+        if registration is not None:
+            await registration.start()
+            started.append(registration)
+
+    async def boot_or_fail():
+        try:
+            await boot()
+        except Exception:
+            logger.exception("Startup failed")
+            state["status"] = "failed"
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Outgoing A2A connections are pooled for the lifetime of the service
+        await a2a_client.startup(peers)
+        booting = asyncio.create_task(boot_or_fail())
+        yield
+        # Uvicorn has already drained in-flight requests by the time we get here
+        state["status"] = "stopping"
+        booting.cancel()
+        try:
+            await booting
+        except asyncio.CancelledError:
+            pass
+        for resource in reversed(started):
+            await resource.close()
+        await a2a_client.shutdown()
+
+    app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
+    app.add_middleware(TelemetryMiddleware)
+
+    @app.get("/healthz")
+    async def healthz():
+        # A service whose agent failed to load needs restarting
+        if state["status"] == "failed":
+            return JSONResponse({"status": "failed"}, status_code=503)
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz():
+        # Not ready until the agent is loaded and its sessions and MCP tools are
+        # started, or once shutting down; "startup" has the seconds each step took
+        body = {"status": state["status"], "startup": state["startup"]}
+        if state["status"] != "ready":
+            return JSONResponse(body, status_code=503)
+        return body
+
+    if card is not None:
+
+        @app.get("/.well-known/agent.json")
+        async def agent_card(request: Request):
+            url = os.getenv("A2A_ADVERTISE_URL") or str(request.base_url).rstrip("/")
+            return {**card, "url": url}
+
+    @app.exception_handler(Rejected)
+    async def rejected(request: Request, error: Rejected):
+        return JSONResponse(
+            {"detail": error.reason},
+            status_code=error.status_code,
+            headers={"Retry-After": str(math.ceil(error.retry_after))},
+        )
+
+    def part(name: str) -> Any:
+        if name not in parts:
+            raise Rejected(503, f"{admission.name} is {state['status']}", 1.0)
+        return parts[name]
+
+    def options(request: Request, default: str = "default"):
+        if state["status"] != "ready":
+            # Still loading the agent, or shutting down
+            raise Rejected(503, f"{admission.name} is {state['status']}", 1.0)
+        priority, timeout = request_options(request.headers, default)
+        # Calls this request makes to other agents and to the model carry the
+        # same priority, and stop waiting for a slot when the caller gives up
+        current_priority.set(priority)
+        current_deadline.set(None if timeout is None else time.monotonic() + timeout)
+        return priority, timeout
+
+    def stream_events(events, release):
+        async def lines():
+            try:
+                async for line in ndjson(events):
+                    yield line
+            finally:
+                release()
+
+        async def release_after_response():
+            # Also covers a client that disconnects before the first event
+            release()
+
+        # One JSON event per line, flushed as soon as it is produced
+        return StreamingResponse(
+            lines(),
+            media_type=NDJSON,
+            background=BackgroundTask(release_after_response),
+        )
 
     @app.post("/run")
-    async def run(payload: Dict[str, Any]):
-        return await agent.execute(payload)
+    async def run(payload: Dict[str, Any], request: Request):
+        async with admission.slot(*options(request)):
+            result = await parts["execute"](payload)
+        # JSON unless the caller asked for a binary encoding (see common/wire.py)
+        media_type, params = negotiate(request.headers.get("accept"))
+        if media_type == JSON:
+            return result
+        return Response(
+            encode(result, media_type, params),
+            media_type=media_type,
+            headers={"Vary": "Accept"},
+        )
+
+    if declared["stream"] is not None:
+
+        @app.post("/stream")
+        async def stream_run(payload: Dict[str, Any], request: Request):
+            release = await admission.acquire(*options(request))
+            return stream_events(parts["stream"](payload), release)
+
+    if declared["run_batch"] is not None:
+
+        @app.post("/run_batch")
+        async def batch_run(request: Request):
+            payloads = await _batch_payloads(request)
+            # Batch work yields to interactive traffic unless told otherwise
+            release = await admission.acquire(*options(request, default="batch"))
+            return stream_events(parts["run_batch"](payloads), release)
+
+    if tasks is not None:
+        # The task store is SQLite: its calls run in threads, off the event loop
+
+        async def get_task(task_id: str):
+            task = await asyncio.to_thread(tasks.get, task_id)
+            if task is None:
+                raise HTTPException(404, f"Unknown task {task_id}")
+            return task
+
+        @app.post("/tasks", status_code=202)
+        async def submit_task(payload: Dict[str, Any], request: Request):
+            # Resubmitting with the same Idempotency-Key returns the same task
+            # instead of running the work again; a full queue answers 429
+            priority, _ = request_options(request.headers)
+            task, created = await asyncio.to_thread(
+                tasks.submit, payload, priority, request.headers.get("Idempotency-Key")
+            )
+            return task if created else DefaultResponse(task)
+
+        @app.get("/tasks/stats")
+        async def task_stats():
+            return await asyncio.to_thread(tasks.stats)
+
+        @app.get("/tasks/{task_id}")
+        async def poll_task(task_id: str):
+            return await get_task(task_id)
+
+        @app.get("/tasks/{task_id}/events")
+        async def task_events(task_id: str):
+            await get_task(task_id)
+            return StreamingResponse(ndjson(tasks.events(task_id)), media_type=NDJSON)
+
+        @app.post("/tasks/{task_id}/cancel")
+        async def cancel_task(task_id: str):
+            await get_task(task_id)
+            return await asyncio.to_thread(tasks.cancel, task_id)
+
+    @app.get("/admission/stats")
+    async def admission_stats():
+        return admission.stats()
+
+    @app.get("/llm/stats")
+    async def llm_stats():
+        return gateway.stats()
+
+    @app.get("/metrics")
+    async def metrics():
+        # Counters are per process; scrape every worker, or run one per service
+        components = {"admission": admission.stats(), "llm": gateway.stats()}
+        for name, component in (
+            ("cache", parts.get("cache")),
+            ("sessions", parts.get("sessions")),
+            ("mcp", parts.get("toolset")),
+            ("hedging", parts.get("hedging")),
+            ("balancer", parts.get("balancer")),
+            ("tasks", tasks),
+        ):
+            if component is not None:
+                components[name] = component.stats()
+        return PlainTextResponse(
+            render_metrics(components), media_type="text/plain; version=0.0.4"
+        )
+
+    if declared["cache"] is not None:
+
+        @app.get("/cache/stats")
+        async def cache_stats():
+            return part("cache").stats()
+
+    if declared["hedging"] is not None:
+
+        @app.get("/hedging/stats")
+        async def hedging_stats():
+            return part("hedging").stats()
+
+    if declared["balancer"] is not None:
+
+        @app.get("/balancer/stats")
+        async def balancer_stats():
+            return part("balancer").stats()
+
+    if declared["sessions"] is not None:
+
+        @app.get("/sessions/stats")
+        async def session_stats():
+            return part("sessions").stats()
+
+    if declared["toolset"] is not None:
+
+        @app.get("/mcp/stats")
+        async def mcp_stats():
+            return part("toolset").stats()
 
     return app
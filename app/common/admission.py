@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# Requests running at once per service worker (0 = unlimited), how many may
+# wait for a slot and for how long before they are turned away
+MAX_IN_FLIGHT = int(os.getenv("A2A_MAX_IN_FLIGHT", "32"))
+MAX_QUEUE = int(os.getenv("A2A_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("A2A_QUEUE_TIMEOUT", "10"))
+
+PRIORITY_HEADER = "X-A2A-Priority"
+# Seconds the caller is willing to wait, so a request is not queued past it
+TIMEOUT_HEADER = "X-A2A-Timeout"
+# Lower runs first; interactive UI traffic beats batch jobs
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2}
+
+# The priority of the request being served, forwarded on calls to other agents
+current_priority: ContextVar[str] = ContextVar("a2a_priority", default="default")
+# When the caller stops waiting (time.monotonic()), for work queued on its behalf
+current_deadline: ContextVar[Optional[float]] = ContextVar("a2a_deadline", default=None)
+
+
+class Rejected(Exception):
+    """A request was not admitted; maps to a 429 or 503 with Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def request_options(
+    headers: Mapping[str, str], default: str = "default"
+) -> Tuple[str, Optional[float]]:
+    """Read the priority class and caller timeout from request headers."""
+    priority = headers.get(PRIORITY_HEADER, default).strip().lower()
+    if priority not in PRIORITIES:
+        priority = default
+    try:
+        timeout = float(headers[TIMEOUT_HEADER])
+    except (KeyError, ValueError):
+        timeout = None
+    return priority, timeout
+
+
+class AdmissionController:
+    """Bounds concurrent requests, with a priority queue in front of the limit.
+
+    When every slot is busy, requests wait in priority order for up to
+    ``queue_timeout`` (or the caller's own timeout, if shorter) and are then
+    rejected with 503. When the queue is full a request is rejected at once
+    with 429, unless it outranks a queued one, which is shed instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.shed = 0
+        self.timed_out = 0
+        # Moving average of how long a request holds its slot, in seconds
+        self.service_time = 1.0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(not future.done() for _, _, future in self._queue)
+
+    def retry_after(self) -> float:
+        # Roughly how long the current backlog takes to drain through the slots
+        slots = max(self.max_in_flight, 1)
+        return max(1.0, self.service_time * (self.waiting + 1) / slots)
+
+    async def acquire(
+        self, priority: str = "default", timeout: Optional[float] = None
+    ) -> Callable[[], None]:
+        """Wait for a slot and return the function that gives it back."""
+        if self.max_in_flight <= 0 or (
+            self.in_flight < self.max_in_flight and not self.waiting
+        ):
+            self.in_flight += 1
+            self.admitted += 1
+            return self._releaser()
+
+        rank = PRIORITIES.get(priority, PRIORITIES["default"])
+        if self.waiting >= self.max_queue:
+            waiters = [entry for entry in self._queue if not entry[2].done()]
+            worst = max(waiters, key=lambda entry: entry[:2], default=None)
+            if worst is None or worst[0] <= rank:
+                self.rejected += 1
+                raise Rejected(429, f"{self.name} is at capacity", self.retry_after())
+            self.shed += 1
+            worst[2].set_exception(
+                Rejected(503, f"{self.name} shed this request", self.retry_after())
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (rank, next(self._seq), future))
+        self.queued += 1
+        wait = (
+            self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        )
+        try:
+            await asyncio.wait_for(future, max(wait, 0))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Rejected(
+                503, f"{self.name} queue wait exceeded {wait:.1f}s", self.retry_after()
+            )
+        except asyncio.CancelledError:
+            # The caller went away just as a slot was handed over
+            if future.done() and not future.cancelled() and not future.exception():
+                self._release(None)
+            raise
+        return self._releaser()
+
+    def _releaser(self) -> Callable[[], None]:
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._release(time.monotonic() - started)
+
+        return release
+
+    def _release(self, elapsed: Optional[float]):
+        if elapsed is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                self.admitted += 1
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "default", timeout: Optional[float] = None):
+        release = await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "service_time": round(self.service_time, 3),
+        }
+
+
+def admission_from_env(name: str) -> AdmissionController:
+    """Controller for one service; ``<NAME>_MAX_IN_FLIGHT`` overrides the limit."""
+    limit = int(os.getenv(f"{name.upper()}_MAX_IN_FLIGHT", MAX_IN_FLIGHT))
+    return AdmissionController(name, max_in_flight=limit)
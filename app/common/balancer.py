@@ -0,0 +1,237 @@
+import asyncio
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import httpx
+from common.a2a_client import AgentBusy, is_busy
+from common.registry import Registry
+from common.telemetry import get_logger
+
+# How replicas are chosen: "ewma" (recent latency times requests in flight) or
+# "least_outstanding" (fewest requests in flight)
+BALANCER = os.getenv("A2A_BALANCER", "ewma")
+# Consecutive failures that eject a replica, and seconds before one trial call
+# is let through to see whether it recovered
+BREAKER_FAILURES = int(os.getenv("A2A_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("A2A_BREAKER_COOLDOWN", "10"))
+# Seconds over which a replica's latency estimate fades while it gets no
+# calls, so a replica that was slow once is tried again
+EWMA_DECAY = float(os.getenv("A2A_BALANCER_DECAY", "10"))
+# Seconds between reads of the registry
+REGISTRY_REFRESH = float(os.getenv("A2A_REGISTRY_REFRESH", "2"))
+
+logger = get_logger(__name__)
+
+
+class NoReplica(Exception):
+    def __init__(self, skill: str):
+        super().__init__(f"No healthy agent for {skill}")
+        self.skill = skill
+
+
+def unhealthy(error: BaseException) -> bool:
+    # Errors that say something is wrong with the replica, not with the request
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, TimeoutError))
+
+
+class Replica:
+    """One agent URL, with the load and health the host has seen from it."""
+
+    def __init__(self, url: str, skill: str):
+        self.url = url
+        self.skill = skill
+        self.outstanding = 0
+        # Moving average of call latency in seconds, once there is one
+        self.latency: Optional[float] = None
+        self.observed = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.ejections = 0
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < BREAKER_FAILURES:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def score(self, strategy: str) -> float:
+        if strategy == "least_outstanding":
+            return self.outstanding
+        # A replica not yet measured scores 0, so it gets tried
+        if self.latency is None:
+            return 0.0
+        fade = math.exp(-(time.monotonic() - self.observed) / EWMA_DECAY)
+        return self.latency * fade * (self.outstanding + 1)
+
+    def _observe(self, elapsed: float):
+        self.observed = time.monotonic()
+        self.latency = (
+            elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        )
+
+    @asynccontextmanager
+    async def track(self):
+        """Count a call to this replica toward its load, latency and health."""
+        if self.state == "half_open":
+            self.probing = True
+        self.outstanding += 1
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            yield
+        except (AgentBusy, asyncio.CancelledError):
+            # A busy agent is shedding load, and a cancelled call is a hedge that
+            # lost or a caller that gave up: neither means the replica is down,
+            # but how long it took so far is a lower bound on its latency
+            elapsed = time.monotonic() - started
+            if self.latency is not None and elapsed > self.latency:
+                self._observe(elapsed)
+            raise
+        except Exception as e:
+            if unhealthy(e):
+                self.errors += 1
+                self.failures += 1
+                if self.failures >= BREAKER_FAILURES:
+                    self.open_until = time.monotonic() + BREAKER_COOLDOWN
+                    self.ejections += 1
+            raise
+        else:
+            self.failures = 0
+            self._observe(time.monotonic() - started)
+        finally:
+            self.outstanding -= 1
+            self.probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "skill": self.skill,
+            "state": self.state,
+            "open": int(self.state == "open"),
+            "outstanding": self.outstanding,
+            "calls": self.calls,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "latency": None if self.latency is None else round(self.latency, 3),
+        }
+
+
+class Balancer:
+    """Spreads calls for each skill over the replicas registered for it.
+
+    Picks the better of two random healthy replicas (by ``strategy``), which
+    follows load closely without every caller piling onto the same one.
+    Replicas that keep failing are ejected by a circuit breaker, unless it is
+    the only one: ejecting it would fail every call until the cooldown ends,
+    where calls to it may succeed. Until any agent with a skill registers,
+    calls go to its ``fallbacks`` URL.
+
+    With ``open_registry``, the registry is opened by ``start`` rather than
+    given, so that importing the module creating the balancer touches no file.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[Registry],
+        fallbacks: Dict[str, str],
+        strategy: str = BALANCER,
+        refresh: float = REGISTRY_REFRESH,
+        open_registry: Optional[Callable[[], Optional[Registry]]] = None,
+    ):
+        self.registry = registry
+        self.open_registry = open_registry
+        self.fallbacks = fallbacks
+        self.strategy = strategy
+        self.refresh = refresh
+        self.replicas: Dict[str, Replica] = {}
+        self._urls: Dict[str, List[str]] = {}
+        self._refreshed: Dict[str, float] = {}
+        self._lookups: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        if self.registry is None and self.open_registry is not None:
+            self.registry = await asyncio.to_thread(self.open_registry)
+            # The next call waits for it instead of using the fallbacks
+            self._urls.clear()
+            self._refreshed.clear()
+
+    async def close(self):
+        if self.registry is not None and self.open_registry is not None:
+            registry, self.registry = self.registry, None
+            await asyncio.to_thread(registry.close)
+
+    async def urls(self, skill: str) -> List[str]:
+        now = time.monotonic()
+        if now - self._refreshed.get(skill, float("-inf")) >= self.refresh:
+            # One registry read per skill at a time, off the event loop; callers
+            # arriving meanwhile keep the URLs already known
+            lookup = self._lookups.get(skill)
+            if lookup is None:
+                lookup = self._lookups[skill] = asyncio.create_task(self._lookup(skill))
+                lookup.add_done_callback(lambda _: self._lookups.pop(skill, None))
+            if skill not in self._urls:
+                await asyncio.shield(lookup)
+        return self._urls[skill]
+
+    async def _lookup(self, skill: str):
+        try:
+            registered = (
+                await asyncio.to_thread(self.registry.lookup, skill)
+                if self.registry
+                else []
+            )
+        except Exception:
+            if skill not in self._urls:
+                raise
+            # Keep the URLs already known until the next refresh
+            logger.warning("Registry lookup failed", exc_info=True)
+            self._refreshed[skill] = time.monotonic()
+            return
+        self._urls[skill] = registered or [self.fallbacks[skill]]
+        self._refreshed[skill] = time.monotonic()
+        # Forget replicas that left, once nothing is waiting on them
+        for url, replica in list(self.replicas.items()):
+            gone = url not in self._urls[skill] and not replica.outstanding
+            if replica.skill == skill and gone:
+                del self.replicas[url]
+
+    async def pick(self, skill: str, exclude: Iterable[str] = ()) -> Replica:
+        """A replica for ``skill``, avoiding ``exclude`` when there is another."""
+        replicas = []
+        for url in await self.urls(skill):
+            if url not in self.replicas:
+                self.replicas[url] = Replica(url, skill)
+            replicas.append(self.replicas[url])
+        if len(replicas) == 1:
+            # Nowhere else to send the call: the breaker only counts its failures
+            return replicas[0]
+        healthy = [replica for replica in replicas if replica.available()]
+        if not healthy:
+            raise NoReplica(skill)
+        exclude = set(exclude)
+        # Prefer replicas not already tried and not asking callers to back off
+        for preferred in (
+            [r for r in healthy if r.url not in exclude and not is_busy(r.url)],
+            [r for r in healthy if r.url not in exclude],
+            healthy,
+        ):
+            if preferred:
+                break
+        if len(preferred) == 1:
+            return preferred[0]
+        return min(random.sample(preferred, 2), key=lambda r: r.score(self.strategy))
+
+    def stats(self) -> Dict[str, Any]:
+        return {url: replica.stats() for url, replica in self.replicas.items()}
@@ -0,0 +1,407 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from shared.schemas import TravelRequest
+
+CACHE_BACKEND = os.getenv("A2A_CACHE_BACKEND", "memory")
+CACHE_TTL = float(os.getenv("A2A_CACHE_TTL", "600"))
+CACHE_MAX_ENTRIES = int(os.getenv("A2A_CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("A2A_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DIR = os.getenv("A2A_CACHE_DIR", os.path.join(os.getcwd(), ".cache"))
+# Budgets in the same band share an answer, for agents whose answer does not
+# have to fit the budget exactly (flights and stays are filtered by it, so
+# they are keyed on the exact budget)
+BUDGET_BAND = float(os.getenv("A2A_CACHE_BUDGET_BAND", "100"))
+
+
+def _normalize_text(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return " ".join(value.split()).casefold()
+
+
+def _normalize_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        return value.strip()
+
+
+def canonical_request(
+    request: TravelRequest,
+    include_origin: bool = True,
+    budget_band: float = BUDGET_BAND,
+) -> Dict[str, Any]:
+    """Reduce a request to the fields that decide an agent's answer."""
+    canonical = {
+        "destination": _normalize_text(request.destination),
+        "start_date": _normalize_date(request.start_date),
+        "end_date": _normalize_date(request.end_date),
+        # Budgets in the same band get the same answer
+        "budget_band": int(request.budget // budget_band)
+        if budget_band
+        else request.budget,
+    }
+    if include_origin:
+        canonical["origin"] = _normalize_text(request.origin)
+    return canonical
+
+
+def request_key(
+    payload: Dict[str, Any],
+    namespace: str,
+    include_origin: bool = True,
+    budget_band: float = BUDGET_BAND,
+) -> Optional[str]:
+    try:
+        request = TravelRequest.model_validate(payload)
+    except ValidationError:
+        return None
+    if not math.isfinite(request.budget):
+        # NaN and infinite budgets are valid requests, but have no band
+        return None
+    canonical = canonical_request(
+        request, include_origin=include_origin, budget_band=budget_band
+    )
+    digest = hashlib.sha256(
+        json.dumps(canonical, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class MemoryBackend:
+    """In-process LRU store bounded by entry count and approximate bytes."""
+
+    # Calls are quick enough to make on the event loop
+    blocking = False
+
+    def __init__(
+        self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple[float, int, str]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ttl: float):
+        self.delete(key)
+        size = len(value)
+        self._entries[key] = (time.time() + ttl, size, value)
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def keys(self) -> List[str]:
+        now = time.time()
+        return [key for key, entry in self._entries.items() if entry[0] >= now]
+
+    def size(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+class DiskBackend:
+    """SQLite-backed LRU store that survives restarts and is shared by workers.
+
+    Calls may wait on another process's write lock, so ``ResponseCache`` makes
+    them from threads; each call holds the connection to itself.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+    ):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)"
+        )
+        # Running totals, kept by triggers so that every worker sharing the
+        # file sees them without counting the table
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache_totals (id INTEGER PRIMARY KEY "
+            "CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO cache_totals "
+            "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        )
+        for trigger, change in (
+            ("AFTER INSERT", "entries = entries + 1, bytes = bytes + NEW.size"),
+            ("AFTER DELETE", "entries = entries - 1, bytes = bytes - OLD.size"),
+            ("AFTER UPDATE OF size", "bytes = bytes + NEW.size - OLD.size"),
+        ):
+            name = "cache_totals_" + trigger.split()[1].lower()
+            self._db.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {name} {trigger} ON cache "
+                f"BEGIN UPDATE cache_totals SET {change}; END"
+            )
+
+    def _totals(self) -> Tuple[int, int]:
+        return self._db.execute("SELECT entries, bytes FROM cache_totals").fetchone()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._db.execute(
+                "UPDATE cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            # One transaction, so that workers sharing the file never evict
+            # against totals another one is changing
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._store(key, value, now, ttl)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _store(self, key: str, value: str, now: float, ttl: float):
+        self._db.execute(
+            "INSERT INTO cache VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE "
+            "SET value = excluded.value, size = excluded.size, "
+            "expires_at = excluded.expires_at, last_access = excluded.last_access",
+            (key, value, len(value), now + ttl, now),
+        )
+        self._db.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        entries, total = self._totals()
+        while entries and (entries > self.max_entries or total > self.max_bytes):
+            # Least recently used first, as many as the bounds are over by
+            # (entries of average size for the byte bound)
+            over = max(
+                entries - self.max_entries,
+                math.ceil((total - self.max_bytes) * entries / total),
+                1,
+            )
+            evicted = self._db.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                (over,),
+            ).rowcount
+            self.evictions += evicted
+            entries, total = self._totals()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key FROM cache WHERE expires_at >= ?", (time.time(),)
+            ).fetchall()
+        return [key for (key,) in rows]
+
+    def size(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._totals()
+        return {"entries": entries, "bytes": total}
+
+
+def _all_sections_are_lists(result: Any) -> bool:
+    # Fallbacks (raw text, empty lists) are never worth serving again
+    return (
+        isinstance(result, dict)
+        and bool(result)
+        and all(isinstance(value, list) and value for value in result.values())
+    )
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        namespace: str,
+        backend=None,
+        ttl: float = CACHE_TTL,
+        include_origin: bool = True,
+        cacheable: Callable[[Any], bool] = _all_sections_are_lists,
+        key: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+    ):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.include_origin = include_origin
+        self.cacheable = cacheable
+        # Maps a payload to its cache key, or None when it cannot be cached
+        self.key = key or (
+            lambda payload: request_key(payload, namespace, include_origin)
+        )
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def _get(self, key: str) -> Optional[str]:
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.backend.get, key)
+        return self.backend.get(key)
+
+    async def _set(self, key: str, result: Any):
+        value = json.dumps(result)
+        if self.backend.blocking:
+            await asyncio.to_thread(self.backend.set, key, value, self.ttl)
+        else:
+            self.backend.set(key, value, self.ttl)
+
+    async def run(
+        self,
+        payload: Dict[str, Any],
+        compute: Callable[[Dict[str, Any]], Awaitable[Any]],
+    ):
+        if self.backend is None:
+            return await compute(payload)
+        key = self.key(payload)
+        if key is None:
+            return await compute(payload)
+
+        cached = await self._get(key)
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+
+        # Identical requests already running share that run's result
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # The leading request was cancelled, so run this one ourselves
+                return await self.run(payload, compute)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute(payload)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.cacheable(result):
+                await self._set(key, result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def lookup(self, payload: Dict[str, Any]) -> Optional[Any]:
+        """Return the cached result for ``payload`` without computing it."""
+        key = self.backend and self.key(payload)
+        if not key:
+            return None
+        cached = await self._get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(cached)
+
+    async def store(self, payload: Dict[str, Any], result: Any):
+        key = self.backend and self.key(payload)
+        if key and self.cacheable(result):
+            await self._set(key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        stats = {
+            "namespace": self.namespace,
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4)
+            if lookups
+            else 0.0,
+            "in_flight": len(self._in_flight),
+        }
+        if self.backend is not None:
+            stats["evictions"] = self.backend.evictions
+            stats.update(self.backend.size())
+        return stats
+
+
+def cache_from_env(
+    namespace: str, include_origin: bool = True, budget_band: float = BUDGET_BAND
+) -> ResponseCache:
+    if CACHE_BACKEND == "disk":
+        backend = DiskBackend(os.path.join(CACHE_DIR, f"{namespace}.sqlite3"))
+    elif CACHE_BACKEND == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = None
+    return ResponseCache(
+        namespace,
+        backend=backend,
+        include_origin=include_origin,
+        key=lambda payload: request_key(
+            payload, namespace, include_origin, budget_band
+        ),
+    )
@@ -0,0 +1,85 @@
+import os
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+from common.mcp_pool import call_tool
+from common.parsing import SectionParser
+from common.telemetry import get_logger
+from google.adk.tools.base_toolset import BaseToolset
+from pydantic import ValidationError
+from shared.schemas import TravelRequest
+
+# Answer fully structured requests by calling the tool directly instead of
+# asking the model to do it; anything else still goes through the model
+DIRECT_TOOLS = os.getenv("A2A_DIRECT_TOOLS", "1") == "1"
+
+# A plain request for agents' prewarm to send down the direct path
+PREWARM_REQUEST = {
+    "origin": "London",
+    "destination": "Paris",
+    "start_date": "2025-01-01",
+    "end_date": "2025-01-03",
+    "budget": 1000,
+}
+
+_FIELDS = set(TravelRequest.model_fields)
+_VAGUE = {"", "unknown", "any", "anywhere", "somewhere", "n/a", "none", "tbd"}
+# A plain place name: letters first, a handful of words, no sentences
+_PLACE = re.compile(r"[^\W\d_][\w .,'’()-]{0,59}")
+
+logger = get_logger(__name__)
+
+
+def _is_place(value: Optional[str]) -> bool:
+    if value is None or value.strip().casefold() in _VAGUE:
+        return False
+    return bool(_PLACE.fullmatch(value.strip())) and len(value.split()) <= 5
+
+
+def structured_request(
+    payload: Any, places: Iterable[str] = ("destination",)
+) -> Optional[TravelRequest]:
+    """Return the request if it maps unambiguously onto tool arguments.
+
+    Returns None for free-form input: unknown non-empty fields, vague or
+    sentence-like places, non-ISO or reversed dates, or a non-positive budget.
+    """
+    if not isinstance(payload, dict):
+        return None
+    if any(
+        key not in _FIELDS and value not in (None, "") for key, value in payload.items()
+    ):
+        return None
+    try:
+        request = TravelRequest.model_validate(payload)
+        start = date.fromisoformat(request.start_date)
+        end = date.fromisoformat(request.end_date)
+    except (ValidationError, ValueError):
+        return None
+    if end < start or request.budget <= 0:
+        return None
+    if not all(_is_place(getattr(request, field)) for field in places):
+        return None
+    return request
+
+
+async def run_direct(
+    toolset: BaseToolset, name: str, args: Dict[str, Any], parser: SectionParser
+) -> Optional[Dict[str, Any]]:
+    """Call ``name`` with ``args`` and parse its result, or None to use the model."""
+    try:
+        value = await call_tool(toolset, name, args)
+    except Exception as e:
+        logger.warning(
+            "Direct tool call failed, falling back to the model",
+            extra={"tool": name, "error": str(e)},
+        )
+        return None
+    if not isinstance(value, list):
+        logger.warning(
+            "Direct tool call returned no list, falling back to the model",
+            extra={"tool": name, "value": repr(value)},
+        )
+        return None
+    return parser.parse_value(value)
@@ -0,0 +1,149 @@
+"""
+OpenAI-compatible stand-in for the model, to run the agents without a provider.
+
+    cd app && uv run python -m common.fake_llm
+    LLM_API_BASE=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake uv run python -m agents.flight_agent
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PORT = int(os.getenv("FAKE_LLM_PORT", "8900"))
+# Seconds each completion takes, and the share of calls answered with a 429
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+# How the latency varies around FAKE_LLM_LATENCY: "fixed", "uniform" (up to
+# JITTER times it either side), "lognormal" (as the median, with sigma JITTER)
+# or "exponential" (as the mean). The seed makes the sequence repeatable.
+LATENCY_DIST = os.getenv("FAKE_LLM_LATENCY_DIST", "fixed")
+JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.5"))
+SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# The agents' prompts spell out tool arguments as name='value' or name=123
+_ARG = re.compile(r"(\w+)=(?:'([^']*)'|(-?\d+(?:\.\d+)?))")
+
+ACTIVITIES = [
+    {
+        "name": "Old town walking tour",
+        "description": "A guided walk through the historic centre.",
+        "price_estimate": 25,
+        "duration_hours": 3,
+    },
+    {
+        "name": "Museum pass",
+        "description": "Entry to the main city museums.",
+        "price_estimate": 60,
+        "duration_hours": 5,
+    },
+]
+
+_random = random.Random(SEED)
+
+app = FastAPI()
+
+
+def _latency() -> float:
+    if LATENCY_DIST == "uniform":
+        return _random.uniform(LATENCY * (1 - JITTER), LATENCY * (1 + JITTER))
+    if LATENCY_DIST == "lognormal":
+        return _random.lognormvariate(math.log(LATENCY), JITTER)
+    if LATENCY_DIST == "exponential":
+        return _random.expovariate(1 / LATENCY)
+    return LATENCY
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content or ""
+
+
+def _reply(messages: List[Dict[str, Any]], tools: List[Dict[str, Any]]):
+    """Call the first tool once, then echo its result; without tools, answer."""
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        return {"role": "assistant", "content": _text(last.get("content"))}
+    if tools:
+        prompt = _text(last.get("content"))
+        args = {
+            name: text if number == "" else float(number)
+            for name, text, number in _ARG.findall(prompt)
+        }
+        call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {
+                "name": tools[0]["function"]["name"],
+                "arguments": json.dumps(args),
+            },
+        }
+        return {"role": "assistant", "content": None, "tool_calls": [call]}
+    return {"role": "assistant", "content": json.dumps({"activities": ACTIVITIES})}
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def completions(body: Dict[str, Any]):
+    if _random.random() < RATE_LIMIT_RATE:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+            status_code=429,
+        )
+    await asyncio.sleep(_latency())
+    message = _reply(body.get("messages", []), body.get("tools") or [])
+    finish = "tool_calls" if message.get("tool_calls") else "stop"
+    prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+    completion_tokens = len(json.dumps(message)) // 4
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    response = {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+    }
+    if not body.get("stream"):
+        choice = {"index": 0, "message": message, "finish_reason": finish}
+        return {
+            **response,
+            "object": "chat.completion",
+            "choices": [choice],
+            "usage": usage,
+        }
+
+    delta = dict(message)
+    for index, call in enumerate(delta.get("tool_calls") or []):
+        call["index"] = index
+
+    def chunks():
+        # The whole reply in one chunk, then usage, as OpenAI streams it
+        chunk = {**response, "object": "chat.completion.chunk"}
+        choice = {"index": 0, "delta": delta, "finish_reason": finish}
+        yield f"data: {json.dumps({**chunk, 'choices': [choice]})}\n\n"
+        yield f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=PORT)
@@ -0,0 +1,168 @@
+import time
+from typing import AsyncGenerator, Optional
+
+import litellm
+from common.admission import PRIORITIES, current_deadline, current_priority
+from common.llm_gateway import (
+    LLM_API_BASE,
+    LLM_COMPLETION_TOKENS,
+    LLM_FALLBACK_MODEL,
+    LLM_LATENCY_SLO,
+    LLM_MODEL,
+    LLM_QUEUE_TIMEOUT,
+    LLM_RETRIES,
+    ModelGate,
+    gateway,
+)
+from common.telemetry import LLM_TOKENS, get_logger, tracer
+from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# Provider errors worth retrying once on the fallback model
+_OVERLOADED = (
+    litellm.RateLimitError,
+    litellm.ServiceUnavailableError,
+    litellm.Timeout,
+)
+
+logger = get_logger(__name__)
+
+
+def estimate_tokens(llm_request: LlmRequest) -> int:
+    # About four characters per token, plus room for the reply
+    size = len(llm_request.model_dump_json(exclude_none=True, include={"contents"}))
+    instruction = llm_request.config.system_instruction if llm_request.config else ""
+    size += len(str(instruction or ""))
+    return size // 4 + LLM_COMPLETION_TOKENS
+
+
+class GatewayLlm(LiteLlm):
+    """``LiteLlm`` whose calls go through the shared ``gateway``.
+
+    Each call waits for rate-limit and concurrency headroom on its model.
+    It is sent to the fallback model instead when the primary is expected to
+    miss the latency SLO or the caller's deadline, and retried there when
+    the primary reports it is overloaded.
+    """
+
+    _fallback: Optional[LiteLlm] = None
+
+    def __init__(self, model: str, fallback: Optional[str] = None, **kwargs):
+        super().__init__(model, **kwargs)
+        if fallback and fallback != model:
+            self._fallback = LiteLlm(fallback, **kwargs)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        tokens = estimate_tokens(llm_request)
+        priority = PRIORITIES.get(current_priority.get(), PRIORITIES["default"])
+        deadline = current_deadline.get() or time.monotonic() + LLM_QUEUE_TIMEOUT
+        primary = gateway.gate(self.model)
+        llm = self._choose(primary, tokens, deadline)
+        for attempt in range(LLM_RETRIES + 1):
+            answered = False
+            try:
+                async for response in self._call(
+                    llm, llm_request, stream, tokens, priority, deadline
+                ):
+                    answered = True
+                    yield response
+                return
+            except _OVERLOADED as e:
+                if answered or attempt == LLM_RETRIES:
+                    raise
+                # Retried on the fallback if there is one; the throttled bucket
+                # paces the retry instead of the client retrying at once
+                retry = self._fallback or self
+                logger.warning(
+                    "Model overloaded, retrying",
+                    extra={
+                        "model": llm.model,
+                        "retry_on": retry.model,
+                        "error": str(e),
+                    },
+                )
+                if llm is self and retry is not self:
+                    primary.fallbacks += 1
+                    self._served_by_fallback("primary overloaded")
+                llm = retry
+
+    def _choose(self, primary: ModelGate, tokens: int, deadline: float) -> LiteLlm:
+        if self._fallback is None:
+            return self
+        budget = min(LLM_LATENCY_SLO, deadline - time.monotonic())
+        expected = primary.expected_latency(tokens)
+        if expected <= budget:
+            return self
+        fallback = gateway.gate(self._fallback.model)
+        if fallback.expected_latency(tokens) >= expected:
+            return self
+        primary.fallbacks += 1
+        self._served_by_fallback("primary would miss its deadline")
+        return self._fallback
+
+    def _served_by_fallback(self, reason: str):
+        # Answers from the fallback may differ from the primary's: make each
+        # one visible
+        logger.warning(
+            "Call served by the fallback model",
+            extra={
+                "model": self.model,
+                "fallback": self._fallback.model,
+                "reason": reason,
+            },
+        )
+
+    async def _call(
+        self,
+        llm: LiteLlm,
+        llm_request: LlmRequest,
+        stream: bool,
+        tokens: int,
+        priority: int,
+        deadline: float,
+    ) -> AsyncGenerator[LlmResponse, None]:
+        gate = gateway.gate(llm.model)
+        with tracer.start_as_current_span(f"llm_queue [{llm.model}]"):
+            release = await gate.acquire(tokens, priority, deadline)
+        usage = None
+        last = None
+        try:
+            async for response in LiteLlm.generate_content_async(
+                llm, llm_request, stream
+            ):
+                if (
+                    response.usage_metadata
+                    and response.usage_metadata.total_token_count
+                ):
+                    usage = response.usage_metadata
+                if last is not None:
+                    yield last
+                last = response
+        except litellm.RateLimitError:
+            gate.throttle()
+            raise
+        finally:
+            release(usage.total_token_count if usage else None)
+        if usage:
+            LLM_TOKENS.observe(
+                usage.prompt_token_count or 0, model=llm.model, kind="prompt"
+            )
+            LLM_TOKENS.observe(
+                usage.candidates_token_count or 0, model=llm.model, kind="completion"
+            )
+        # Held back until the slot is free: the runner may stop reading after it
+        if last is not None:
+            yield last
+
+
+def gateway_llm(**kwargs) -> GatewayLlm:
+    """The model for an agent: ``LLM_MODEL`` behind the shared gateway."""
+    if LLM_API_BASE:
+        kwargs.setdefault("api_base", LLM_API_BASE)
+    # Overload errors come straight back to the gateway rather than being
+    # retried inside the client
+    kwargs.setdefault("max_retries", 0)
+    return GatewayLlm(LLM_MODEL, fallback=LLM_FALLBACK_MODEL or None, **kwargs)
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Send a second copy of a sub-agent call once it has taken longer than this
+# percentile of recent calls ("0" turns hedging off)
+HEDGE_PERCENTILE = float(os.getenv("A2A_HEDGE_PERCENTILE", "95"))
+# Hedges allowed, as a share of calls; unused allowance carries over up to
+# HEDGE_BURST hedges
+HEDGE_BUDGET = float(os.getenv("A2A_HEDGE_BUDGET", "0.05"))
+HEDGE_BURST = float(os.getenv("A2A_HEDGE_BURST", "5"))
+# No hedging until this many latencies are known, and never sooner than this
+HEDGE_MIN_SAMPLES = int(os.getenv("A2A_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("A2A_HEDGE_MIN_DELAY", "0.05"))
+# Recent latencies the percentile is taken over
+HEDGE_WINDOW = 256
+
+
+class SkipHedge(Exception):
+    """Raised by a hedge that has nowhere better to go than the first copy."""
+
+
+class Hedger:
+    """Hedged calls to one agent, with the latency history and budget they need.
+
+    A call that has not finished after the ``percentile`` of recent latencies
+    is sent again, and whichever copy succeeds first is used; the other one is
+    cancelled. Each call earns ``budget`` of a hedge, so hedges stay under
+    that share of the traffic even when the agent slows down as a whole. A
+    hedge that raises ``SkipHedge`` is given back and not counted.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float = HEDGE_PERCENTILE,
+        budget: float = HEDGE_BUDGET,
+        burst: float = HEDGE_BURST,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        min_delay: float = HEDGE_MIN_DELAY,
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.credit = burst
+        self.latencies: deque = deque(maxlen=HEDGE_WINDOW)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+        self.cancelled = 0
+        self.skipped = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little data."""
+        if self.percentile <= 0 or len(self.latencies) < self.min_samples:
+            return None
+        cuts = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return max(self.min_delay, cuts[min(int(self.percentile), 99) - 1])
+
+    def _spend(self) -> bool:
+        if self.credit < 1:
+            self.denied += 1
+            return False
+        self.credit -= 1
+        return True
+
+    async def run(self, attempt: Callable[[int], Awaitable[Any]]) -> Any:
+        """Return the first successful ``attempt(n)``; n is 0, then 1 for the hedge."""
+        self.calls += 1
+        self.credit = min(self.burst, self.credit + self.budget)
+        delay = self.delay()
+        attempts: List[asyncio.Task] = [asyncio.create_task(self._timed(attempt, 0))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and self._spend():
+                self.hedged += 1
+                attempts.append(asyncio.create_task(self._timed(attempt, 1)))
+            pending = set(attempts)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                skipped = [
+                    task for task in done if isinstance(task.exception(), SkipHedge)
+                ]
+                if skipped:
+                    attempts.remove(skipped[0])
+                    self.hedged -= 1
+                    self.credit += 1
+                    self.skipped += 1
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    if succeeded[0] is not attempts[0]:
+                        self.hedge_wins += 1
+                    return succeeded[0].result()
+                # A failed copy still leaves the other one to wait for
+                if not pending:
+                    return attempts[-1].result()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    self.cancelled += 1
+                    task.cancel()
+
+    async def _timed(self, attempt: Callable[[int], Awaitable[Any]], n: int) -> Any:
+        started = time.monotonic()
+        result = await attempt(n)
+        # Only successes: fast failures would pull the percentile down
+        self.latencies.append(time.monotonic() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.delay()
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "win_rate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            "hedge_ratio": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "denied": self.denied,
+            "cancelled": self.cancelled,
+            "skipped": self.skipped,
+            "delay": None if delay is None else round(delay, 3),
+            "credit": round(self.credit, 2),
+        }
+
+
+class Hedgers(dict):
+    """A ``Hedger`` per agent, by name, served at /hedging/stats."""
+
+    def __init__(self, names):
+        super().__init__((name, Hedger(name)) for name in names)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: hedger.stats() for name, hedger in self.items()}
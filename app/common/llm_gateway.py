@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.admission import Rejected
+
+# Model every agent uses, and the cheaper, faster one calls move to when the
+# primary would miss the latency SLO or is overloaded; off unless set, since
+# its answers may differ from the primary's (e.g. "openai/gpt-4o-mini")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+# OpenAI-compatible endpoint to call instead of the provider, e.g. common.fake_llm
+LLM_API_BASE = os.getenv("LLM_API_BASE") or None
+# Seconds a model call (queueing included) should take at most
+LLM_LATENCY_SLO = float(os.getenv("LLM_LATENCY_SLO", "10"))
+# How long a call waits for rate-limit headroom when the caller set no deadline
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+# Reply tokens charged up front, corrected once the provider reports usage
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "500"))
+# Retries after the provider reports it is overloaded, paced by the buckets
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+
+
+def _limits(prefix: str) -> Dict[str, float]:
+    # Limits are per process: divide the provider quota by the worker count
+    return {
+        "rpm": float(os.getenv(f"{prefix}_RPM", "500")),
+        "tpm": float(os.getenv(f"{prefix}_TPM", "30000")),
+        "concurrency": int(os.getenv(f"{prefix}_CONCURRENCY", "16")),
+    }
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units evenly and holds at most that many.
+
+    A non-positive rate means unlimited. The level may go negative when a
+    call turns out to use more than was charged, delaying the next ones.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        if self.rate > 0:
+            self._refill()
+            self.level -= amount
+
+    def drain(self):
+        # The provider said we are over its limit, whatever our count says
+        if self.rate > 0:
+            self._refill()
+            self.level = min(self.level, 0.0)
+
+
+class ModelGate:
+    """Request and token buckets plus a concurrency cap for one model.
+
+    Calls wait in a queue ordered by priority, then by deadline, and give up
+    with 503 once their deadline passes.
+    """
+
+    def __init__(self, model: str, rpm: float, tpm: float, concurrency: int):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        # Moving average of call latency in seconds, once there is one
+        self.latency: Optional[float] = None
+        self.calls = 0
+        self.tokens_used = 0
+        self.queued = 0
+        self.timed_out = 0
+        self.throttled = 0
+        self.fallbacks = 0
+        self._queue: List[Tuple[int, float, int, asyncio.Future, int]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(not entry[3].done() for entry in self._queue)
+
+    def expected_wait(self, tokens: int) -> float:
+        """Rough seconds a call of ``tokens`` would queue before it starts."""
+        waiters = [entry for entry in self._queue if not entry[3].done()]
+        rate_wait = max(
+            self.requests.delay(len(waiters) + 1),
+            self.tokens.delay(sum(entry[4] for entry in waiters) + tokens),
+        )
+        if self.concurrency <= 0 or (self.in_flight < self.concurrency and not waiters):
+            return rate_wait
+        slot_wait = (self.latency or 0.0) * (len(waiters) + 1) / self.concurrency
+        return max(rate_wait, slot_wait)
+
+    def expected_latency(self, tokens: int) -> float:
+        return self.expected_wait(tokens) + (self.latency or 0.0)
+
+    async def acquire(
+        self, tokens: int, priority: int, deadline: float
+    ) -> Callable[[Optional[int]], None]:
+        """Wait for headroom and return the function to call with the tokens used."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queue, (priority, deadline, next(self._seq), future, tokens)
+        )
+        self._pump()
+        if not future.done():
+            self.queued += 1
+        try:
+            await asyncio.wait_for(future, max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Rejected(
+                503,
+                f"{self.model} is over its rate limit",
+                max(self.expected_wait(tokens), 1.0),
+            )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(tokens, None, None)
+            raise
+        return self._releaser(tokens)
+
+    def _pump(self):
+        while self._queue:
+            _, _, _, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if 0 < self.concurrency <= self.in_flight:
+                return
+            # A call bigger than a whole minute's budget goes once the bucket is full
+            needed = min(tokens, self.tokens.capacity)
+            delay = max(self.requests.delay(1), self.tokens.delay(needed))
+            if delay > 0:
+                if self._timer is None:
+                    loop = asyncio.get_running_loop()
+                    self._timer = loop.call_later(delay, self._wake)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _wake(self):
+        self._timer = None
+        self._pump()
+
+    def _releaser(self, charged: int) -> Callable[[Optional[int]], None]:
+        started = time.monotonic()
+        released = False
+
+        def release(used: Optional[int] = None):
+            nonlocal released
+            if not released:
+                released = True
+                self._release(charged, used, time.monotonic() - started)
+
+        return release
+
+    def _release(self, charged: int, used: Optional[int], elapsed: Optional[float]):
+        self.in_flight -= 1
+        self.calls += 1
+        if used is not None:
+            self.tokens_used += used
+            self.tokens.take(used - charged)
+        if elapsed is not None:
+            self.latency = (
+                elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+            )
+        self._pump()
+
+    def throttle(self):
+        self.throttled += 1
+        self.requests.drain()
+        self.tokens.drain()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "queued": self.queued,
+            "timed_out": self.timed_out,
+            "throttled": self.throttled,
+            "fallbacks": self.fallbacks,
+            "tokens_used": self.tokens_used,
+            "request_budget": round(self.requests.level, 1),
+            "token_budget": round(self.tokens.level, 1),
+            "latency": None if self.latency is None else round(self.latency, 3),
+        }
+
+
+class Gateway:
+    """One ``ModelGate`` per model, shared by every agent in the process."""
+
+    def __init__(self):
+        self.gates: Dict[str, ModelGate] = {}
+
+    def gate(self, model: str) -> ModelGate:
+        if model not in self.gates:
+            prefix = "LLM_FALLBACK" if model == LLM_FALLBACK_MODEL else "LLM"
+            self.gates[model] = ModelGate(model, **_limits(prefix))
+        return self.gates[model]
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: gate.stats() for model, gate in self.gates.items()}
+
+
+# The ADK model that waits on these gates is common.gateway_llm, kept apart so
+# that serving stats from here does not import LiteLLM
+gateway = Gateway()
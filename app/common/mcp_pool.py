@@ -0,0 +1,207 @@
+import asyncio
+import importlib.util
+import itertools
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from common.parsing import tool_result_value
+from common.telemetry import get_logger, tracer
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools import FunctionTool
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
+
+# "pool" keeps warm MCP server processes, "inprocess" calls the tool functions
+# directly and "stdio" is the original one-toolset-per-agent setup
+MCP_TRANSPORT = os.getenv("A2A_MCP_TRANSPORT", "pool")
+MCP_WORKERS = int(os.getenv("A2A_MCP_WORKERS", "2"))
+MCP_HEALTH_INTERVAL = float(os.getenv("A2A_MCP_HEALTH_INTERVAL", "15"))
+MCP_HEALTH_TIMEOUT = float(os.getenv("A2A_MCP_HEALTH_TIMEOUT", "5"))
+
+MCP_SERVER_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "mcp", "server.py")
+)
+# app/mcp would shadow the mcp SDK package, so the server is loaded by path
+SERVER_MODULE_NAME = "travel_mcp_server"
+
+logger = get_logger(__name__)
+
+
+def load_server_module():
+    module = sys.modules.get(SERVER_MODULE_NAME)
+    if module is not None:
+        return module
+    server_dir = os.path.dirname(MCP_SERVER_PATH)
+    if server_dir not in sys.path:
+        # Lets the server import its sibling modules, as it does when run as a script
+        sys.path.append(server_dir)
+    spec = importlib.util.spec_from_file_location(SERVER_MODULE_NAME, MCP_SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[SERVER_MODULE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def server_tool(name: str):
+    """Return the plain Python function behind an MCP server tool."""
+    tool = getattr(load_server_module(), name)
+    # Newer fastmcp versions wrap decorated functions in a Tool object
+    return getattr(tool, "fn", tool)
+
+
+async def call_tool(toolset: BaseToolset, name: str, args: Dict[str, Any]) -> Any:
+    """Call one of ``toolset``'s tools directly, without a model in the loop."""
+    for tool in await toolset.get_tools():
+        if tool.name == name:
+            # Named like ADK's own tool spans, so both land in one stage
+            with tracer.start_as_current_span(f"tool_call [{name}]"):
+                response = await tool.run_async(args=args, tool_context=None)
+            return tool_result_value(response)
+    raise KeyError(f"{name} is not in this toolset")
+
+
+def _stdio_params() -> StdioServerParameters:
+    return StdioServerParameters(command=sys.executable, args=[MCP_SERVER_PATH])
+
+
+class MCPToolPool(BaseToolset):
+    """Round-robins tool calls across warm, health-checked MCP server processes."""
+
+    def __init__(self, tool_filter: List[str], workers: int = MCP_WORKERS):
+        self.tool_filter = tool_filter
+        self.workers = max(1, workers)
+        self.restarts = 0
+        self._toolsets: List[Optional[MCPToolset]] = [None] * self.workers
+        self._tools: List[Optional[List[BaseTool]]] = [None] * self.workers
+        self._locks = [asyncio.Lock() for _ in range(self.workers)]
+        self._next = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def _worker_tools(self, index: int) -> List[BaseTool]:
+        async with self._locks[index]:
+            if self._tools[index] is None:
+                toolset = MCPToolset(
+                    connection_params=_stdio_params(), tool_filter=self.tool_filter
+                )
+                self._toolsets[index] = toolset
+                # Listing tools spawns the server and keeps its session open
+                self._tools[index] = await toolset.get_tools()
+            return self._tools[index]
+
+    async def _restart(self, index: int):
+        async with self._locks[index]:
+            toolset = self._toolsets[index]
+            self._toolsets[index] = None
+            self._tools[index] = None
+        if toolset is not None:
+            try:
+                await toolset.close()
+            except Exception as e:
+                logger.warning(
+                    "MCP worker close failed", extra={"worker": index, "error": str(e)}
+                )
+        self.restarts += 1
+        await self._worker_tools(index)
+
+    async def _check(self, index: int):
+        toolset = self._toolsets[index]
+        try:
+            if toolset is None:
+                raise RuntimeError("not started")
+            # Listing tools is a round trip to the server through the public
+            # API; MCPToolset does not expose its session to ping
+            tools = await asyncio.wait_for(toolset.get_tools(), MCP_HEALTH_TIMEOUT)
+            if self._toolsets[index] is toolset:
+                self._tools[index] = tools
+        except Exception as e:
+            logger.warning(
+                "MCP worker unhealthy, restarting",
+                extra={"worker": index, "error": repr(e)},
+            )
+            await self._restart(index)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(MCP_HEALTH_INTERVAL)
+            for index in range(self.workers):
+                try:
+                    await self._check(index)
+                except Exception:
+                    logger.exception(
+                        "MCP worker restart failed", extra={"worker": index}
+                    )
+
+    async def start(self):
+        await asyncio.gather(*(self._worker_tools(i) for i in range(self.workers)))
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def get_tools(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> List[BaseTool]:
+        return await self._worker_tools(next(self._next) % self.workers)
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for index, toolset in enumerate(self._toolsets):
+            self._toolsets[index] = None
+            self._tools[index] = None
+            if toolset is not None:
+                await toolset.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": "pool",
+            "workers": self.workers,
+            "running": sum(tools is not None for tools in self._tools),
+            "restarts": self.restarts,
+        }
+
+
+class InProcessTravelTools(BaseToolset):
+    """Exposes the MCP server's tool functions directly, without a subprocess."""
+
+    def __init__(self, tool_filter: List[str]):
+        self.tool_filter = tool_filter
+        self._tools: Optional[List[BaseTool]] = None
+
+    async def start(self):
+        await self.get_tools()
+
+    async def get_tools(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> List[BaseTool]:
+        if self._tools is None:
+            self._tools = [FunctionTool(server_tool(name)) for name in self.tool_filter]
+        return self._tools
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transport": "inprocess", "tools": self.tool_filter}
+
+
+class StdioTravelTools(MCPToolset):
+    """The original single MCP subprocess, started lazily on first use."""
+
+    def __init__(self, tool_filter: List[str]):
+        super().__init__(connection_params=_stdio_params(), tool_filter=tool_filter)
+
+    async def start(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transport": "stdio"}
+
+
+def travel_toolset(tool_filter: List[str]) -> BaseToolset:
+    if MCP_TRANSPORT == "inprocess":
+        return InProcessTravelTools(tool_filter)
+    if MCP_TRANSPORT == "stdio":
+        return StdioTravelTools(tool_filter)
+    return MCPToolPool(tool_filter)
@@ -0,0 +1,316 @@
+import ast
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from common.telemetry import get_logger, tracer
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = get_logger(__name__)
+
+# Brackets, or whole strings matched in one step so their contents are never
+# scanned for brackets. A single quote only starts a (Python-style) string
+# where a value can start, so apostrophes in prose are ignored. A lone quote
+# means the string has not been fully received yet.
+_TOKEN = re.compile(
+    r"[\[\]{}]"
+    r'|"[^"\\]*(?:\\.[^"\\]*)*"|"'
+    r"|(?<=[\[{,:])\s*(?:'[^'\\]*(?:\\.[^'\\]*)*'|')"
+)
+_CLOSERS = {"{": "}", "[": "]"}
+_FENCE = re.compile(r"^\s*```[\w-]*[ \t]*\n?(.*?)\n?```\s*$", re.DOTALL)
+
+
+def loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def strip_fences(text: str) -> str:
+    """Remove a surrounding Markdown code fence, if there is one."""
+    match = _FENCE.match(text)
+    return match.group(1).strip() if match else text.strip()
+
+
+def _decode(text: str) -> Any:
+    try:
+        return loads(text)
+    except ValueError:
+        pass
+    # Models sometimes answer with Python dict syntax ('name': 'x')
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        raise ValueError("not a JSON or Python literal")
+    if not isinstance(value, (dict, list)):
+        raise ValueError("not an object or array")
+    return value
+
+
+class JSONScanner:
+    """Finds the first balanced JSON object or array in text fed in chunks.
+
+    Text before the value (prose, code fences) is dropped and the rest is
+    scanned once, so streamed tokens can be fed as they arrive and the value
+    is decoded as soon as its closing bracket is seen. Candidates that do not
+    decode, or that ``accept`` rejects, are skipped: the balanced values seen
+    inside one are tried next, in order, without scanning them again.
+    """
+
+    def __init__(self, accept: Optional[Callable[[Any], bool]] = None):
+        self.accept = accept
+        self.done = False
+        self.value: Any = None
+        self._reset("")
+
+    def _reset(self, text: str):
+        self._text = text
+        self._position = 0
+        # Closing bracket and start of each candidate still open, outermost first
+        self._stack: List[Tuple[str, int]] = []
+        # Start and end of the balanced values inside the open candidates
+        self._inner: List[Tuple[int, int]] = []
+
+    def feed(self, chunk: str) -> bool:
+        """Scan ``chunk`` and return True once a complete value was decoded."""
+        if self.done or not chunk:
+            return self.done
+        self._text += chunk
+        return self._resume()
+
+    def close(self) -> bool:
+        """Mark the end of input, trying the values inside candidates that
+        never closed, then the text after a string that never ended."""
+        while not self.done and self._text:
+            self._stack.clear()
+            if not self._try(sorted(self._inner)):
+                # Past the unterminated string, or nothing left if there is none
+                self._reset(self._text[self._position + 1 :])
+                self._resume()
+        return self.done
+
+    def _resume(self) -> bool:
+        while not self.done:
+            if not self._stack and not self._seek_start():
+                return False
+            if not self._scan():
+                return False
+        return True
+
+    def _seek_start(self) -> bool:
+        text = self._text
+        starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+        if not starts:
+            self._text = ""
+            return False
+        self._reset(text[min(starts) :])
+        return True
+
+    def _scan(self) -> bool:
+        """Advance through the buffer; False means more input is needed."""
+        text = self._text
+        position = self._position
+        while True:
+            match = _TOKEN.search(text, position)
+            if match is None:
+                # Leave trailing whitespace unscanned so a quote arriving in
+                # the next chunk still sees the comma or bracket before it
+                self._position = len(text.rstrip())
+                return False
+            token = match.group().lstrip()
+            if token in ('"', "'"):
+                # Unterminated string: rescan it once more text arrives
+                self._position = match.start()
+                return False
+            position = match.end()
+            if token in _CLOSERS:
+                self._stack.append((_CLOSERS[token], match.start()))
+            elif token in ("]", "}"):
+                closer, start = self._stack.pop()
+                if token == closer and self._stack:
+                    self._inner.append((start, position))
+                    continue
+                # A mismatched bracket is inside every open candidate
+                self._stack.clear()
+                closed = [(start, position)] if token == closer else []
+                return self._settle(closed, position)
+
+    def _settle(self, closed: List[Tuple[int, int]], end: int) -> bool:
+        # The candidate that just closed, if any, then the values inside it;
+        # scanning goes on after ``end``
+        if not self._try(closed + sorted(self._inner)):
+            self._reset(self._text[end:])
+        return True
+
+    def _try(self, spans: List[Tuple[int, int]]) -> bool:
+        for start, end in spans:
+            try:
+                value = _decode(self._text[start:end])
+            except ValueError:
+                # Balanced but not decodable, e.g. "[sic]" in prose
+                continue
+            if self.accept is None or self.accept(value):
+                self.value = value
+                self.done = True
+                self._reset("")
+                return True
+        return False
+
+
+def extract_json(text: str) -> Any:
+    """Return the first JSON object or array in ``text``, or None."""
+    scanner = JSONScanner()
+    scanner.feed(text)
+    scanner.close()
+    return scanner.value
+
+
+def tool_result_value(response: Any) -> Any:
+    """Unwrap a tool response into the value the tool returned.
+
+    Handles ADK's ``{"result": ...}`` wrapper for non-dict results and MCP
+    ``CallToolResult`` objects, whose JSON arrives as text content.
+    """
+    if isinstance(response, dict) and list(response) == ["result"]:
+        response = response["result"]
+    content = getattr(response, "content", None)
+    if content is None and isinstance(response, dict):
+        content = response.get("content")
+    if not isinstance(content, list):
+        return response
+    text = "".join(
+        (part.get("text") if isinstance(part, dict) else getattr(part, "text", None))
+        or ""
+        for part in content
+    )
+    try:
+        return loads(text)
+    except ValueError:
+        # Tool errors come back as plain text
+        return text
+
+
+def return_tool_result(tool, args, tool_context, tool_response):
+    """after_tool_callback that ends the run with the tool's own result.
+
+    The model is not called again to restate the result as text, which saves
+    its output tokens and the time spent generating them.
+    """
+    tool_context.actions.skip_summarization = True
+    return {"result": tool_result_value(tool_response)}
+
+
+def response_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAI strict JSON-schema ``response_format`` for a Pydantic model."""
+
+    def strict(schema):
+        if isinstance(schema, dict):
+            schema.pop("default", None)
+            if schema.get("type") == "object" and "properties" in schema:
+                schema["additionalProperties"] = False
+                schema["required"] = list(schema["properties"])
+            for value in schema.values():
+                strict(value)
+        elif isinstance(schema, list):
+            for value in schema:
+                strict(value)
+        return schema
+
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": strict(model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+class SectionParser:
+    """Turns an agent's reply into ``{section: [validated items]}``.
+
+    Accepts ``{"<section>": [...]}`` or a bare array, with or without code
+    fences and surrounding prose. Items that fail validation are dropped.
+    Unparseable replies become an empty list, or the fence-stripped text when
+    ``raw_fallback`` is set so it can still be shown to the user.
+    """
+
+    def __init__(
+        self, section: str, item_model: Type[BaseModel], raw_fallback: bool = False
+    ):
+        self.section = section
+        self.item_model = item_model
+        self.raw_fallback = raw_fallback
+
+    def scanner(self) -> JSONScanner:
+        return JSONScanner(accept=self._accepts)
+
+    def _items(self, value: Any) -> Optional[list]:
+        if isinstance(value, list):
+            return value
+        if isinstance(value, dict):
+            items = value.get(self.section)
+            if isinstance(items, list):
+                return items
+            # Wrong key: fall back to the first list in the object
+            return next((v for v in value.values() if isinstance(v, list)), None)
+        return None
+
+    def _accepts(self, value: Any) -> bool:
+        # Skip things like "[1]" in prose that cannot be a list of items
+        items = self._items(value)
+        return items is not None and all(isinstance(item, dict) for item in items)
+
+    def _validate(self, items: list) -> List[Dict[str, Any]]:
+        valid = []
+        for item in items:
+            try:
+                model = self.item_model.model_validate(item)
+            except ValidationError as e:
+                logger.info(
+                    "Dropping invalid item",
+                    extra={"section": self.section, "error": e.errors()[0]["msg"]},
+                )
+                continue
+            valid.append(model.model_dump(exclude_none=True))
+        return valid
+
+    def parse(self, text: str, scanner: Optional[JSONScanner] = None) -> Dict[str, Any]:
+        """Parse a full reply, reusing ``scanner`` if it already saw the reply."""
+        if scanner is None or not scanner.done:
+            with tracer.start_as_current_span(f"scan [{self.section}]"):
+                scanner = self.scanner()
+                scanner.feed(text or "")
+                scanner.close()
+        return self.parse_value(scanner.value, text or "")
+
+    def parse_value(self, value: Any, text: str = "") -> Dict[str, Any]:
+        with tracer.start_as_current_span(f"parse [{self.section}]"):
+            items = self._items(value)
+            if items is None:
+                logger.warning(
+                    "No JSON found in response",
+                    extra={"section": self.section, "response": text or value},
+                )
+                return {self.section: strip_fences(text) if self.raw_fallback else []}
+            valid = self._validate(items)
+        logger.debug(
+            "Returning parsed items",
+            extra={"section": self.section, "items": len(valid)},
+        )
+        return {self.section: valid}
+
+    def parse_event(self, event, scanner: Optional[JSONScanner] = None):
+        """Parse a final ADK event, which is a tool response when summarization
+        was skipped and the model's reply otherwise."""
+        responses = event.get_function_responses()
+        if responses:
+            return self.parse_value(tool_result_value(responses[0].response))
+        return self.parse(event.content.parts[0].text, scanner)
+
+    def __call__(self, text: str) -> Dict[str, Any]:
+        return self.parse(text)
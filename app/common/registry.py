@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from common.cache import CACHE_DIR
+from common.telemetry import get_logger
+
+# SQLite file the services register in and the host looks agents up in, or
+# "off" to use the fixed URLs only
+REGISTRY = os.getenv("A2A_REGISTRY", os.path.join(CACHE_DIR, "registry.sqlite3"))
+# How often a service renews its entry, and how long an entry lasts without it
+REGISTRY_HEARTBEAT = float(os.getenv("A2A_REGISTRY_HEARTBEAT", "5"))
+REGISTRY_TTL = float(os.getenv("A2A_REGISTRY_TTL", "15"))
+
+logger = get_logger(__name__)
+
+
+def load_card(path: str) -> Dict[str, Any]:
+    """An agent card, as served at /.well-known/agent.json."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def skills(card: Dict[str, Any]) -> List[str]:
+    return [skill["id"] for skill in card.get("skills", [])]
+
+
+class Registry:
+    """The agents that are up, by URL, with the card each one published.
+
+    A stand-in for a real service registry: a SQLite file every service on the
+    machine shares. An entry whose heartbeat is older than ``ttl`` is treated
+    as gone, so a replica that dies without deregistering drops out.
+
+    Calls may wait on another process's write lock, so services make them
+    from threads; each call holds the connection to itself.
+    """
+
+    def __init__(self, path: str, ttl: float = REGISTRY_TTL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS agents ("
+            "url TEXT PRIMARY KEY, name TEXT NOT NULL, card TEXT NOT NULL, "
+            "heartbeat_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS skills ("
+            "skill TEXT NOT NULL, url TEXT NOT NULL, PRIMARY KEY (skill, url))"
+        )
+
+    def register(self, url: str, card: Dict[str, Any]):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO agents VALUES (?, ?, ?, ?)",
+                    (url, card["name"], json.dumps({**card, "url": url}), time.time()),
+                )
+                self._db.execute("DELETE FROM skills WHERE url = ?", (url,))
+                self._db.executemany(
+                    "INSERT INTO skills VALUES (?, ?)",
+                    [(skill, url) for skill in skills(card)],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, url: str) -> bool:
+        """Renew ``url``'s entry; False if it is gone and must register again."""
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE agents SET heartbeat_at = ? WHERE url = ?", (time.time(), url)
+            )
+        return updated.rowcount > 0
+
+    def deregister(self, url: str):
+        with self._lock:
+            self._db.execute("DELETE FROM skills WHERE url = ?", (url,))
+            self._db.execute("DELETE FROM agents WHERE url = ?", (url,))
+
+    def lookup(self, skill: str) -> List[str]:
+        """URLs of the live agents with ``skill``."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT agents.url FROM skills JOIN agents USING (url) "
+                "WHERE skill = ? AND heartbeat_at >= ? ORDER BY agents.url",
+                (skill, time.time() - self.ttl),
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def agents(self) -> List[Dict[str, Any]]:
+        """Cards of every live agent."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT card FROM agents WHERE heartbeat_at >= ? ORDER BY url",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        return [json.loads(card) for (card,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Registration:
+    """Keeps one service's card in the registry while the service is up."""
+
+    def __init__(
+        self,
+        registry: Registry,
+        url: str,
+        card: Dict[str, Any],
+        interval: float = REGISTRY_HEARTBEAT,
+    ):
+        self.registry = registry
+        self.url = url
+        self.card = card
+        self.interval = interval
+        self._loop: Optional[asyncio.Task] = None
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self._renew)
+            except sqlite3.Error:
+                logger.exception("Registry heartbeat failed")
+
+    def _renew(self):
+        # Re-register after another worker of this service deregistered
+        if not self.registry.heartbeat(self.url):
+            self.registry.register(self.url, self.card)
+
+    async def start(self):
+        await asyncio.to_thread(self.registry.register, self.url, self.card)
+        self._loop = asyncio.create_task(self._beat())
+        logger.info(
+            "Registered %s at %s",
+            self.card["name"],
+            self.url,
+            extra={"url": self.url, "skills": skills(self.card)},
+        )
+
+    async def close(self):
+        if self._loop is not None:
+            self._loop.cancel()
+        await asyncio.to_thread(self.registry.deregister, self.url)
+        await asyncio.to_thread(self.registry.close)
+
+
+def registry_from_env() -> Optional[Registry]:
+    return None if REGISTRY == "off" else Registry(REGISTRY)
+
+
+def registration_from_env(card: Dict[str, Any]) -> Optional[Registration]:
+    """Registration of this process's service, or None when it cannot be found.
+
+    ``serve`` sets ``A2A_ADVERTISE_URL`` to the address the service listens on.
+    """
+    url = os.getenv("A2A_ADVERTISE_URL")
+    registry = registry_from_env()
+    if registry is None or url is None:
+        return None
+    return Registration(registry, url, card)
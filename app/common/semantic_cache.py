@@ -0,0 +1,183 @@
+import math
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.cache import (
+    CACHE_BACKEND,
+    CACHE_DIR,
+    DiskBackend,
+    MemoryBackend,
+    ResponseCache,
+    _normalize_text,
+    cache_from_env,
+)
+from pydantic import ValidationError
+from shared.schemas import TravelRequest
+
+# "1" answers requests from near-duplicate earlier ones; "0" keeps the exact cache
+SEMANTIC_CACHE = os.getenv("A2A_SEMANTIC_CACHE", "0") == "1"
+# An answer computed for a budget up to this many times smaller is reused (1.5
+# lets 1400 reuse the answer for 1000, but not 1600); never a larger budget,
+# whose answer may not fit
+BUDGET_RATIO = float(os.getenv("A2A_SEMANTIC_BUDGET_RATIO", "1.5"))
+
+
+def semantic_key(payload: Dict[str, Any], namespace: str) -> Optional[str]:
+    """``namespace:nights:budget:destination``, or None when it cannot be cached.
+
+    The start date and origin are left out; the budget is kept exact so that
+    near-duplicates can be found by it.
+    """
+    try:
+        request = TravelRequest.model_validate(payload)
+        nights = (
+            date.fromisoformat(request.end_date.strip())
+            - date.fromisoformat(request.start_date.strip())
+        ).days
+    except (ValidationError, ValueError):
+        return None
+    if not math.isfinite(request.budget) or request.budget <= 0:
+        return None
+    destination = _normalize_text(request.destination)
+    return f"{namespace}:{nights}:{request.budget!r}:{destination}"
+
+
+def _split(key: str) -> Optional[Tuple[str, float]]:
+    # Only requests for the same place and trip length are neighbours
+    try:
+        namespace, nights, budget, destination = key.split(":", 3)
+        return f"{namespace}:{nights}:{destination}", float(budget)
+    except ValueError:
+        return None
+
+
+class BudgetIndex:
+    """Keys by place and trip length, with the budget each was computed for."""
+
+    def __init__(self):
+        self._partitions: Dict[str, Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._partitions.values())
+
+    def clear(self):
+        self._partitions.clear()
+
+    def add(self, key: str):
+        split = _split(key)
+        if split is not None:
+            self._partitions.setdefault(split[0], {})[key] = split[1]
+
+    def remove(self, key: str):
+        split = _split(key)
+        keys = self._partitions.get(split[0]) if split else None
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._partitions[split[0]]
+
+    def neighbours(self, key: str, ratio: float) -> List[str]:
+        """Keys for the same trip with a budget ``ratio`` times smaller at most,
+        closest first."""
+        split = _split(key)
+        if split is None:
+            return []
+        partition, budget = split
+        keys = self._partitions.get(partition, {})
+        near = [k for k, b in keys.items() if budget / ratio <= b <= budget]
+        return sorted(near, key=lambda k: -keys[k])
+
+
+class SemanticBackend:
+    """Wraps a cache backend to also answer a missing key with a near-duplicate.
+
+    Keys are ``semantic_key`` strings. On a miss, an entry for the same
+    destination and trip length whose budget is a little smaller is used
+    instead. The index holds the keys in the backend at start plus what this
+    process stored since: entries added by other workers of a disk cache are
+    found by exact key until the next restart.
+    """
+
+    def __init__(self, backend, ratio: float = BUDGET_RATIO):
+        self.backend = backend
+        self.ratio = ratio
+        self.near_hits = 0
+        self.index = BudgetIndex()
+        # Calls to a disk backend come from several threads
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def blocking(self) -> bool:
+        return self.backend.blocking
+
+    @property
+    def evictions(self) -> int:
+        return self.backend.evictions
+
+    def _load(self):
+        keys = self.backend.keys()
+        with self._lock:
+            self.index.clear()
+            for key in keys:
+                self.index.add(key)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            neighbours = self.index.neighbours(key, self.ratio)
+        for neighbour in neighbours:
+            value = self.backend.get(neighbour)
+            if value is not None:
+                self.near_hits += 1
+                return value
+            # Expired, or evicted
+            with self._lock:
+                self.index.remove(neighbour)
+        return None
+
+    def set(self, key: str, value: str, ttl: float):
+        self.backend.set(key, value, ttl)
+        with self._lock:
+            self.index.add(key)
+            full = len(self.index) > 2 * self.backend.max_entries
+        # Evictions do not reach the index; drop their keys now and then
+        if full:
+            self._load()
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+        with self._lock:
+            self.index.remove(key)
+
+    def size(self) -> Dict[str, int]:
+        return {
+            **self.backend.size(),
+            "indexed": len(self.index),
+            "near_hits": self.near_hits,
+        }
+
+
+def semantic_cache_from_env(namespace: str) -> ResponseCache:
+    """A cache keyed by destination, trip length and budget.
+
+    Reusable by any agent whose answer does not depend on the origin or the
+    exact dates. It uses the ``A2A_CACHE_BACKEND`` store; without
+    ``A2A_SEMANTIC_CACHE=1``, or with the cache off, it is the exact cache.
+    """
+    if not SEMANTIC_CACHE or CACHE_BACKEND not in ("memory", "disk"):
+        return cache_from_env(namespace, include_origin=False)
+    if CACHE_BACKEND == "disk":
+        backend = DiskBackend(os.path.join(CACHE_DIR, f"{namespace}.nearby.sqlite3"))
+    else:
+        backend = MemoryBackend()
+    return ResponseCache(
+        namespace,
+        backend=SemanticBackend(backend),
+        include_origin=False,
+        key=lambda payload: semantic_key(payload, namespace),
+    )
@@ -0,0 +1,35 @@
+import os
+
+import uvicorn
+from fastapi import FastAPI
+
+HOST = os.getenv("A2A_HOST", "127.0.0.1")
+WORKERS = int(os.getenv("A2A_WORKERS", "1"))
+# Seconds to let in-flight requests finish after SIGTERM before closing them
+GRACEFUL_SHUTDOWN = float(os.getenv("A2A_GRACEFUL_SHUTDOWN", "30"))
+
+
+def serve(app: FastAPI, import_path: str, port: int, name: str):
+    """Run an agent service on ``<NAME>_PORT`` (default ``port``), with
+    ``<NAME>_WORKERS`` worker processes.
+
+    Workers re-import the app from ``import_path``, so each has its own
+    runner, sessions and MCP tools and the services can use several cores.
+    """
+    workers = int(os.getenv(f"{name.upper()}_WORKERS", WORKERS))
+    # Another replica of a service only needs another port
+    port = int(os.getenv(f"{name.upper()}_PORT", port))
+    # Where the service registers itself; workers inherit it
+    address = "127.0.0.1" if HOST in ("0.0.0.0", "::") else HOST
+    os.environ["A2A_ADVERTISE_URL"] = os.getenv(
+        f"{name.upper()}_ADVERTISE_URL", f"http://{address}:{port}"
+    )
+    options = {
+        "host": HOST,
+        "port": port,
+        "timeout_graceful_shutdown": GRACEFUL_SHUTDOWN,
+    }
+    if workers > 1:
+        uvicorn.run(import_path, workers=workers, **options)
+    else:
+        uvicorn.run(app, **options)
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from common.cache import CACHE_DIR
+from common.telemetry import get_logger, tracer
+from google.adk.events import Event
+from google.adk.sessions import (
+    BaseSessionService,
+    DatabaseSessionService,
+    InMemorySessionService,
+    Session,
+)
+
+SESSION_IDLE_TTL = float(os.getenv("A2A_SESSION_IDLE_TTL", "300"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("A2A_SESSION_SWEEP_INTERVAL", "30"))
+SESSION_MAX = int(os.getenv("A2A_SESSION_MAX", "1000"))
+SESSION_POOL_SIZE = int(os.getenv("A2A_SESSION_POOL_SIZE", "0"))
+# "memory" keeps sessions in the worker process, "sqlite" shares a local file
+# between workers and any other value is used as a SQLAlchemy database URL
+SESSION_STORE = os.getenv("A2A_SESSION_STORE", "memory")
+
+logger = get_logger(__name__)
+
+
+class SizedSessionService(InMemorySessionService):
+    """``InMemorySessionService`` that keeps a running count of the bytes its
+    sessions hold, so that reading it does not serialize every session.
+
+    Each session counts its JSON size when created plus the JSON size of each
+    event appended to it. Only the service's public methods are overridden.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._sizes: Dict[Tuple[str, str, str], int] = {}
+        self._totals: Dict[Tuple[str, str], int] = {}
+
+    def _resize(self, key: Tuple[str, str, str], size: int):
+        change = size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self._totals[key[:2]] = self._totals.get(key[:2], 0) + change
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._resize((app_name, user_id, session.id), len(session.model_dump_json()))
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str):
+        await super().delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        key = (app_name, user_id, session_id)
+        if key in self._sizes:
+            self._totals[key[:2]] -= self._sizes.pop(key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        key = (session.app_name, session.user_id, session.id)
+        if not event.partial and key in self._sizes:
+            self._resize(key, self._sizes[key] + len(event.model_dump_json()))
+        return event
+
+    def stored_bytes(self, app_name: str, user_id: str) -> int:
+        return self._totals.get((app_name, user_id), 0)
+
+
+def session_service_from_env(name: str) -> BaseSessionService:
+    if SESSION_STORE == "memory":
+        return SizedSessionService()
+    if SESSION_STORE == "sqlite":
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"{name}_sessions.sqlite3")
+        # WAL lets workers read while another one writes; the mode is stored
+        # in the file, so setting it once covers every connection
+        with sqlite3.connect(path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+        return DatabaseSessionService(f"sqlite:///{path}")
+    return DatabaseSessionService(SESSION_STORE)
+
+
+class SessionManager:
+    """Owns the lifecycle of the per-request sessions an agent creates.
+
+    Sessions are deleted as soon as a request finishes. A background sweeper
+    removes any that are left idle past ``idle_ttl``, and the least recently
+    used idle session is evicted when ``max_sessions`` is reached. With
+    ``pool_size`` > 0, finished sessions are wiped and reused instead of being
+    deleted and recreated.
+    """
+
+    def __init__(
+        self,
+        session_service: BaseSessionService,
+        app_name: str,
+        user_id: str,
+        prefix: str,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        max_sessions: int = SESSION_MAX,
+        pool_size: int = SESSION_POOL_SIZE,
+        sweep_interval: float = SESSION_SWEEP_INTERVAL,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.user_id = user_id
+        self.prefix = prefix
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.pool_size = pool_size
+        self.sweep_interval = sweep_interval
+        self.created = 0
+        self.deleted = 0
+        self.evicted = 0
+        self.reused = 0
+        # Session id -> last use time, least recently used first
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._in_use: set[str] = set()
+        self._pool: list[str] = []
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def session(self):
+        session_id = await self._acquire()
+        try:
+            yield session_id
+        finally:
+            await self._release(session_id)
+
+    async def _acquire(self) -> str:
+        if self._pool:
+            session_id = self._pool.pop()
+            self.reused += 1
+        else:
+            session_id = f"{self.prefix}_{uuid.uuid4().hex[:8]}"
+            with tracer.start_as_current_span("create_session"):
+                await self._make_room()
+                await self.session_service.create_session(
+                    app_name=self.app_name, user_id=self.user_id, session_id=session_id
+                )
+            self.created += 1
+        self._in_use.add(session_id)
+        self._touch(session_id)
+        return session_id
+
+    async def _release(self, session_id: str):
+        self._in_use.discard(session_id)
+        if len(self._pool) < self.pool_size:
+            try:
+                await self._reset(session_id)
+            except Exception as e:
+                logger.warning(
+                    "Session reset failed, deleting instead", extra={"error": str(e)}
+                )
+            else:
+                self._pool.append(session_id)
+                self._touch(session_id)
+                return
+        await self._delete(session_id)
+
+    def _touch(self, session_id: str):
+        self._last_used[session_id] = time.monotonic()
+        self._last_used.move_to_end(session_id)
+
+    async def _reset(self, session_id: str):
+        # A pooled session must not leak the previous request's history; made
+        # anew through the public API rather than cleared in the store
+        await self.session_service.delete_session(
+            app_name=self.app_name, user_id=self.user_id, session_id=session_id
+        )
+        await self.session_service.create_session(
+            app_name=self.app_name, user_id=self.user_id, session_id=session_id
+        )
+
+    async def _delete(self, session_id: str):
+        self._last_used.pop(session_id, None)
+        if session_id in self._pool:
+            self._pool.remove(session_id)
+        try:
+            await self.session_service.delete_session(
+                app_name=self.app_name, user_id=self.user_id, session_id=session_id
+            )
+        except Exception as e:
+            logger.warning("Session deletion failed", extra={"error": str(e)})
+            return
+        self.deleted += 1
+
+    async def _make_room(self):
+        while len(self._last_used) >= self.max_sessions:
+            idle = next(
+                (sid for sid in self._last_used if sid not in self._in_use), None
+            )
+            if idle is None:
+                # Every session is serving a request, so go over the cap briefly
+                return
+            await self._delete(idle)
+            self.evicted += 1
+
+    async def sweep(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = [
+            sid
+            for sid, last_used in self._last_used.items()
+            if last_used < cutoff and sid not in self._in_use
+        ]
+        for session_id in expired:
+            await self._delete(session_id)
+            self.evicted += 1
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    async def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for session_id in list(self._last_used):
+            await self._delete(session_id)
+
+    def _stored_bytes(self) -> Optional[int]:
+        # Only counted by SizedSessionService; databases are not measured
+        if isinstance(self.session_service, SizedSessionService):
+            return self.session_service.stored_bytes(self.app_name, self.user_id)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "app_name": self.app_name,
+            "live": len(self._last_used),
+            "in_use": len(self._in_use),
+            "pooled": len(self._pool),
+            "bytes": self._stored_bytes(),
+            "created": self.created,
+            "deleted": self.deleted,
+            "evicted": self.evicted,
+            "reused": self.reused,
+        }
@@ -0,0 +1,45 @@
+from typing import Any, AsyncIterator, Dict
+
+from common.parsing import SectionParser
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.genai import types
+
+# Ask the model for partial responses so tokens can be forwarded as they arrive
+STREAMING = RunConfig(streaming_mode=StreamingMode.SSE)
+
+
+async def run_events(
+    runner: Runner,
+    user_id: str,
+    session_id: str,
+    prompt: str,
+    parser: SectionParser,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream an agent run as plain dict events, ending with the parsed result."""
+    message = types.Content(role="user", parts=[types.Part(text=prompt)])
+    # Tokens are scanned as they arrive, so the final reply is not parsed again
+    scanner = parser.scanner()
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=message,
+        run_config=STREAMING,
+    ):
+        if event.partial:
+            parts = event.content.parts if event.content and event.content.parts else []
+            text = "".join(part.text or "" for part in parts)
+            if text:
+                scanner.feed(text)
+                yield {"type": "token", "text": text}
+        elif event.is_final_response():
+            # Not returning here: the run is read to its end so ADK's spans close
+            yield {"type": "result", "data": parser.parse_event(event, scanner)}
+        elif event.get_function_calls():
+            # Text before a tool call is not the final answer
+            scanner = parser.scanner()
+            for call in event.get_function_calls():
+                yield {"type": "tool_call", "name": call.name}
+        elif event.get_function_responses():
+            for response in event.get_function_responses():
+                yield {"type": "tool_result", "name": response.name}
@@ -0,0 +1,450 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from common.admission import PRIORITIES, Rejected, current_priority
+from common.cache import CACHE_DIR
+
+# Tasks one service process runs at once
+TASK_WORKERS = int(os.getenv("A2A_TASK_WORKERS", "4"))
+# How often workers look for tasks submitted to other processes, renew their
+# leases and notice cancellations, and how long a lease lasts without renewal
+TASK_POLL_INTERVAL = float(os.getenv("A2A_TASK_POLL_INTERVAL", "1"))
+TASK_LEASE = float(os.getenv("A2A_TASK_LEASE", "30"))
+# Submitted tasks waiting for a worker, across processes, before new ones are
+# turned away with a 429 ("0" = unlimited)
+TASK_MAX_QUEUE = int(os.getenv("A2A_TASK_MAX_QUEUE", "1000"))
+# Seconds finished tasks are kept before they are deleted
+TASK_TTL = float(os.getenv("A2A_TASK_TTL", "86400"))
+
+STATES = ("submitted", "working", "completed", "failed", "canceled")
+FINAL_STATES = STATES[2:]
+_PRIORITY_NAMES = {rank: name for name, rank in PRIORITIES.items()}
+
+
+class TaskQueue:
+    """Durable queue of ``execute`` runs, stored in SQLite.
+
+    ``submit`` stores a task and returns at once, and workers claim submitted
+    tasks and store their result. Every state change is appended to the
+    task's history. Processes can share the file: a running task holds a lease
+    that its worker renews, and a task whose lease lapses because its process
+    died is handed out again.
+
+    Without ``execute``, ``create_app`` hands it the service's own once the
+    agent is loaded; workers only start after that. ``submit``, ``get``,
+    ``cancel`` and ``stats`` may be called from other threads, so that the
+    server keeps SQLite off its event loop; the workers make their own calls
+    from threads too.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        execute: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        workers: int = TASK_WORKERS,
+        poll_interval: float = TASK_POLL_INTERVAL,
+        lease: float = TASK_LEASE,
+        ttl: float = TASK_TTL,
+        max_queue: int = TASK_MAX_QUEUE,
+    ):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.execute = execute
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.ttl = ttl
+        self.max_queue = max_queue
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.requeued = 0
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, idempotency_key TEXT UNIQUE, "
+            "state TEXT NOT NULL, priority INTEGER NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, owner TEXT, lease_until REAL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (state, priority, created_at)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS task_events ("
+            "seq INTEGER PRIMARY KEY, task_id TEXT NOT NULL, state TEXT NOT NULL, "
+            "at REAL NOT NULL, detail TEXT)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS task_events_task ON task_events (task_id, seq)"
+        )
+        self._running: Dict[str, asyncio.Task] = {}
+        self._loops: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Event()
+        # One statement or transaction at a time on the shared connection
+        self._lock = threading.RLock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._closing = False
+
+    def _on_loop(self, callback: Callable[[], None]):
+        # Events and tasks belong to the event loop's thread
+        if self._loop is None or threading.get_ident() == self._loop_thread:
+            callback()
+        else:
+            self._loop.call_soon_threadsafe(callback)
+
+    def _transaction(self, work: Callable[[], Any]) -> Any:
+        # IMMEDIATE takes the write lock up front, so two processes can never
+        # claim the same task
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        self._on_loop(self._notify)
+        return result
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _record(self, task_id: str, state: str, detail: Optional[str] = None):
+        self._db.execute(
+            "INSERT INTO task_events (task_id, state, at, detail) VALUES (?, ?, ?, ?)",
+            (task_id, state, time.time(), detail),
+        )
+
+    def _notify(self):
+        # Wake subscribers waiting on the current event, then re-arm
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def submit(
+        self,
+        payload: Dict[str, Any],
+        priority: str = "default",
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Store a new task, or return the one already made for the key.
+
+        Returns the task and whether it was created by this call.
+        """
+
+        def insert():
+            if idempotency_key is not None:
+                row = self._db.execute(
+                    "SELECT id FROM tasks WHERE idempotency_key = ?",
+                    (idempotency_key,),
+                ).fetchone()
+                if row is not None:
+                    return row[0], False
+            if self.max_queue:
+                (waiting,) = self._db.execute(
+                    "SELECT COUNT(*) FROM tasks WHERE state = 'submitted'"
+                ).fetchone()
+                if waiting >= self.max_queue:
+                    raise Rejected(429, "Task queue is full", self.poll_interval)
+            task_id = uuid.uuid4().hex
+            now = time.time()
+            self._db.execute(
+                "INSERT INTO tasks (id, idempotency_key, state, priority, payload, "
+                "created_at, updated_at) VALUES (?, ?, 'submitted', ?, ?, ?, ?)",
+                (
+                    task_id,
+                    idempotency_key,
+                    PRIORITIES.get(priority, PRIORITIES["default"]),
+                    json.dumps(payload),
+                    now,
+                    now,
+                ),
+            )
+            self._record(task_id, "submitted")
+            return task_id, True
+
+        task_id, created = self._transaction(insert)
+        if created:
+            self._on_loop(self._wakeup.set)
+        return self.get(task_id), created
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT id, state, priority, payload, result, error, created_at, "
+            "updated_at FROM tasks WHERE id = ?",
+            (task_id,),
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "id": row[0],
+            "state": row[1],
+            "priority": _PRIORITY_NAMES.get(row[2], "default"),
+            "request": json.loads(row[3]),
+            "result": None if row[4] is None else json.loads(row[4]),
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+            "history": self._history(task_id),
+        }
+
+    def _history(self, task_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT seq, state, at, detail FROM task_events "
+            "WHERE task_id = ? AND seq > ? ORDER BY seq",
+            (task_id, after),
+        )
+        return [
+            {"seq": seq, "state": state, "at": at, "detail": detail}
+            for seq, state, at, detail in rows
+        ]
+
+    async def events(self, task_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the task's state changes, past and future, until it finishes."""
+        last = 0
+        while True:
+            changed = self._changed
+            for event in await asyncio.to_thread(self._history, task_id, last):
+                last = event["seq"]
+                yield {"type": "state", "id": task_id, **event}
+                if event["state"] in FINAL_STATES:
+                    task = await asyncio.to_thread(self.get, task_id)
+                    yield {
+                        "type": "result",
+                        "id": task_id,
+                        "state": task["state"],
+                        "data": task["result"],
+                        "error": task["error"],
+                    }
+                    return
+            # Local changes wake us at once; other processes' on the next poll
+            try:
+                await asyncio.wait_for(changed.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def cancel(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a task that has not finished; finished tasks are left as is."""
+
+        def update():
+            cursor = self._db.execute(
+                "UPDATE tasks SET state = 'canceled', owner = NULL, "
+                "lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND state IN ('submitted', 'working')",
+                (time.time(), task_id),
+            )
+            if cursor.rowcount:
+                self._record(task_id, "canceled")
+
+        self._transaction(update)
+
+        def stop():
+            running = self._running.get(task_id)
+            if running is not None:
+                running.cancel()
+
+        self._on_loop(stop)
+        return self.get(task_id)
+
+    def _claim(self) -> Optional[Tuple[str, Dict[str, Any], int]]:
+        # A plain read first: idle workers poll, and should not take the write
+        # lock every time to find nothing
+        waiting = self._query("SELECT 1 FROM tasks WHERE state = 'submitted' LIMIT 1")
+        if not waiting:
+            return None
+
+        def claim():
+            if self._closing:
+                # close() requeues this owner's tasks; none may be claimed after
+                return None
+            row = self._db.execute(
+                "SELECT id, payload, priority FROM tasks WHERE state = 'submitted' "
+                "ORDER BY priority, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._db.execute(
+                "UPDATE tasks SET state = 'working', owner = ?, lease_until = ?, "
+                "updated_at = ? WHERE id = ?",
+                (self.owner, now + self.lease, now, row[0]),
+            )
+            self._record(row[0], "working", self.owner)
+            return row[0], json.loads(row[1]), row[2]
+
+        return self._transaction(claim)
+
+    def _finish(self, task_id: str, state: str, result: Any = None, error=None):
+        def update():
+            # A task canceled or handed to another worker meanwhile keeps that state
+            cursor = self._db.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = ?, owner = NULL, "
+                "lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND state = 'working' AND owner = ?",
+                (
+                    state,
+                    None if result is None else json.dumps(result),
+                    error,
+                    time.time(),
+                    task_id,
+                    self.owner,
+                ),
+            )
+            if cursor.rowcount:
+                self._record(task_id, state, error)
+
+        self._transaction(update)
+
+    def _requeue(self, where: str, params: tuple, detail: str) -> int:
+        def update():
+            ids = [
+                row[0]
+                for row in self._db.execute(
+                    f"SELECT id FROM tasks WHERE state = 'working' AND {where}", params
+                ).fetchall()
+            ]
+            for task_id in ids:
+                self._db.execute(
+                    "UPDATE tasks SET state = 'submitted', owner = NULL, "
+                    "lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (time.time(), task_id),
+                )
+                self._record(task_id, "submitted", detail)
+            return len(ids)
+
+        count = self._transaction(update)
+        self.requeued += count
+        return count
+
+    async def _work(self):
+        while True:
+            claimed = await asyncio.to_thread(self._claim)
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task_id, payload, priority = claimed
+            current_priority.set(_PRIORITY_NAMES.get(priority, "default"))
+            run = asyncio.create_task(self.execute(payload))
+            self._running[task_id] = run
+            try:
+                result = await asyncio.shield(run)
+            except asyncio.CancelledError:
+                if not run.cancelled():
+                    # The worker itself is stopping; close() requeues the task
+                    run.cancel()
+                    raise
+                # Canceled through cancel(), which already stored the new state
+                continue
+            except Exception as e:
+                await asyncio.to_thread(self._finish, task_id, "failed", error=str(e))
+            else:
+                await asyncio.to_thread(
+                    self._finish, task_id, "completed", result=result
+                )
+            finally:
+                self._running.pop(task_id, None)
+
+    def _housekeep(self, running: List[str]) -> Tuple[set, int]:
+        """Renew this owner's leases, requeue lapsed ones and delete old tasks.
+
+        Returns which of the ``running`` tasks this owner still holds, and how
+        many tasks went back to the queue.
+        """
+        now = time.time()
+        self._query(
+            "UPDATE tasks SET lease_until = ? WHERE owner = ? AND state = 'working'",
+            (now + self.lease, self.owner),
+        )
+        owned = set()
+        if running:
+            owned = {
+                task_id
+                for (task_id,) in self._query(
+                    "SELECT id FROM tasks WHERE state = 'working' AND owner = ? "
+                    f"AND id IN ({', '.join('?' * len(running))})",
+                    (self.owner, *running),
+                )
+            }
+        requeued = self._requeue("lease_until < ?", (now,), "lease expired")
+        self._query(
+            "DELETE FROM task_events WHERE task_id IN (SELECT id FROM tasks "
+            "WHERE state IN ('completed', 'failed', 'canceled') AND updated_at < ?)",
+            (now - self.ttl,),
+        )
+        self._query(
+            "DELETE FROM tasks WHERE state IN ('completed', 'failed', 'canceled') "
+            "AND updated_at < ?",
+            (now - self.ttl,),
+        )
+        return owned, requeued
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            running = list(self._running)
+            owned, requeued = await asyncio.to_thread(self._housekeep, running)
+            # Stop local runs of tasks canceled through another process, or
+            # whose lease lapsed and that went back to the queue or to another
+            # worker, so their model and tool calls are not made twice
+            for task_id in running:
+                run = self._running.get(task_id)
+                if task_id not in owned and run is not None:
+                    run.cancel()
+            if requeued:
+                self._wakeup.set()
+            self._notify()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._loops = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._loops.append(asyncio.create_task(self._maintain()))
+
+    async def close(self):
+        self._closing = True
+        for loop in self._loops:
+            loop.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+        # Unfinished work goes back in the queue for the next worker or restart
+        await asyncio.to_thread(
+            self._requeue, "owner = ?", (self.owner,), "requeued on shutdown"
+        )
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._query("SELECT state, COUNT(*) FROM tasks GROUP BY state"))
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "requeued": self.requeued,
+            **{state: counts.get(state, 0) for state in STATES},
+        }
+
+
+def task_queue_from_env(
+    name: str, execute: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None
+) -> TaskQueue:
+    return TaskQueue(os.path.join(CACHE_DIR, f"{name}_tasks.sqlite3"), execute)
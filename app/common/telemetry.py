@@ -0,0 +1,282 @@
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+LOG_LEVEL = os.getenv("A2A_LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for plain lines when reading a terminal
+LOG_FORMAT = os.getenv("A2A_LOG_FORMAT", "json")
+# Where finished spans go besides the stage histograms: "none", "console" or
+# "otlp" (needs the optional opentelemetry-exporter-otlp package)
+TRACE_EXPORTER = os.getenv("A2A_TRACE_EXPORTER", "none")
+
+SERVICE = {"name": "agent"}
+
+tracer = trace.get_tracer("a2a")
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class _TraceFilter(logging.Filter):
+    # Runs in the thread that logs, where the current span is still known
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = trace.get_current_span().get_span_context()
+        if context.is_valid:
+            record.trace_id = format(context.trace_id, "032x")
+            record.span_id = format(context.span_id, "016x")
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "service": SERVICE["name"],
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+def _setup_logging():
+    # Records are queued and written by a background thread, so logging never
+    # blocks the event loop on a slow stdout
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(_TraceFilter())
+    listener = logging.handlers.QueueListener(records, output)
+    listener.start()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # One line per outgoing request is noise next to our own spans
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Flush queued records on exit
+    atexit.register(listener.stop)
+    return listener
+
+
+# Started by setup_telemetry, so that importing this module leaves the
+# importer's logging alone
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+class Histogram:
+    """Prometheus-style histogram with labels, kept in process memory."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        buckets: Sequence[float],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Label values -> per-bucket counts (the last is +Inf), sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self, const_labels: Dict[str, str]) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total) in sorted(self._series.items()):
+            labels = {**const_labels, **dict(zip(self.labels, key))}
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                yield f"{self.name}_bucket{_labels({**labels, 'le': le})} {cumulative}"
+            yield f"{self.name}_sum{_labels(labels)} {total[0]}"
+            yield f"{self.name}_count{_labels(labels)} {cumulative}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+STAGE_SECONDS = Histogram(
+    "a2a_stage_seconds",
+    "Time spent in each stage of handling a request (one per span name)",
+    ("stage",),
+    LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "a2a_request_seconds",
+    "HTTP request latency, until the response body is sent",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "a2a_llm_tokens",
+    "Tokens per model call",
+    ("model", "kind"),
+    TOKEN_BUCKETS,
+)
+HISTOGRAMS = (STAGE_SECONDS, REQUEST_SECONDS, LLM_TOKENS)
+
+
+def _gauges(name: str, stats: Dict[str, Any], labels: Dict[str, str]) -> List[str]:
+    # Numeric fields of a component's stats() as gauges, e.g. a2a_cache_hits
+    lines = []
+    for field, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"a2a_{name}_{field}{_labels(labels)} {value}")
+    return lines
+
+
+# Components whose stats() has one entry per model, agent or replica, and the
+# label for it
+_LABELLED = {"llm": "model", "hedging": "agent", "balancer": "replica"}
+
+
+def render_metrics(components: Dict[str, Any]) -> str:
+    """Prometheus text exposition of the histograms and component stats."""
+    const = {"service": SERVICE["name"]}
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render(const))
+    for name, stats in components.items():
+        if name in _LABELLED:
+            # One entry per model, or per agent
+            for key, entry in stats.items():
+                lines.extend(_gauges(name, entry, {**const, _LABELLED[name]: key}))
+        else:
+            lines.extend(_gauges(name, stats, const))
+    return "\n".join(lines) + "\n"
+
+
+class _StageMetrics(SpanProcessor):
+    """Turns every finished span, ours or ADK's, into a stage latency sample."""
+
+    def on_end(self, span: ReadableSpan):
+        if span.kind == trace.SpanKind.SERVER or span.end_time is None:
+            return
+        STAGE_SECONDS.observe((span.end_time - span.start_time) / 1e9, stage=span.name)
+
+
+def _exporter():
+    if TRACE_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if TRACE_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+        except ImportError:
+            get_logger(__name__).warning(
+                "A2A_TRACE_EXPORTER=otlp but opentelemetry-exporter-otlp is missing"
+            )
+            return None
+        return OTLPSpanExporter()
+    return None
+
+
+def setup_telemetry(service: str):
+    """Name this process's logs and metrics, send its logs to stdout and start
+    recording spans."""
+    global _listener
+    SERVICE["name"] = service
+    if _listener is None:
+        _listener = _setup_logging()
+    if isinstance(trace.get_tracer_provider(), TracerProvider):
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service}))
+    provider.add_span_processor(_StageMetrics())
+    exporter = _exporter()
+    if exporter is not None:
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def inject_trace(headers: Dict[str, str], span: Optional[trace.Span] = None):
+    """Add W3C trace context for the current (or given) span to ``headers``."""
+    context = trace.set_span_in_context(span) if span is not None else None
+    propagate.inject(headers, context=context)
+
+
+class TelemetryMiddleware:
+    """Continues the caller's trace and times every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = {
+            k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]
+        }
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with tracer.start_as_current_span(
+            f"{method} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=trace.SpanKind.SERVER,
+        ) as span:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                # The matched route template keeps task ids out of the labels
+                route = getattr(scope.get("route"), "path", "unmatched")
+                span.update_name(f"{method} {route}")
+                span.set_attribute("http.status_code", status["code"])
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    method=method,
+                    route=route,
+                    status=status["code"],
+                )
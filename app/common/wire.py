@@ -0,0 +1,196 @@
+"""
+Encodings an agent's /run answer can travel in, picked by the caller's Accept
+header. JSON is the default; the binary ones matter for large answers, whose
+lists of options repeat every key in every item.
+
+- ``application/msgpack``: the same structure in a compact binary form
+  (needs the optional ``msgpack`` package).
+- ``application/vnd.apache.arrow.stream``: lists of options with the same
+  fields become Arrow record batches, one column per field, optionally
+  compressed with ``zstd`` or ``lz4``; what is left of the answer travels as
+  JSON in the first stream's metadata (needs ``pyarrow``, which Streamlit
+  already installs).
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.telemetry import get_logger
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+FORMATS = {"json": JSON, "msgpack": MSGPACK, "arrow": ARROW}
+
+# Encoding asked of other agents: "json", "msgpack" or "arrow"
+WIRE_FORMAT = os.getenv("A2A_WIRE_FORMAT", "json")
+# Compression of Arrow columns: "none", "zstd" or "lz4"
+WIRE_COMPRESSION = os.getenv("A2A_WIRE_COMPRESSION", "none")
+
+# Lists shorter than this stay in the JSON part of an Arrow answer
+ARROW_MIN_ROWS = 8
+# Stands for the n-th table in the JSON part of an Arrow answer
+_TABLE = "$arrow"
+
+logger = get_logger(__name__)
+
+
+def available(media_type: str) -> bool:
+    if media_type == MSGPACK:
+        return msgpack is not None
+    if media_type == ARROW:
+        return pa is not None
+    return media_type == JSON
+
+
+def accept(format: str = WIRE_FORMAT, compression: str = WIRE_COMPRESSION) -> str:
+    """The Accept header asking for ``format``, with JSON as the fallback."""
+    media_type = FORMATS.get(format, JSON)
+    if media_type == JSON:
+        return JSON
+    if not available(media_type):
+        logger.warning(
+            "A2A_WIRE_FORMAT=%s needs a package that is missing, using JSON", format
+        )
+        return JSON
+    if media_type == ARROW and compression != "none":
+        media_type = f"{media_type}; compression={compression}"
+    return f"{media_type}, {JSON}; q=0.5"
+
+
+def negotiate(header: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """The media type to answer with for an Accept header, and its parameters."""
+    offers = []
+    for position, item in enumerate((header or "").split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        options = dict(param.partition("=")[::2] for param in params if "=" in param)
+        try:
+            quality = float(options.pop("q", "1"))
+        except ValueError:
+            quality = 0.0
+        offers.append((-quality, position, media_type.lower(), options))
+    for quality, _, media_type, options in sorted(offers):
+        if quality >= 0 or media_type in (JSON, "*/*", "application/*"):
+            break
+        if available(media_type):
+            return media_type, options
+    return JSON, {}
+
+
+def _is_table(value: Any) -> bool:
+    # A list of flat records with the same fields, like the agents' options
+    if not isinstance(value, list) or len(value) < ARROW_MIN_ROWS:
+        return False
+    first = value[0]
+    if not isinstance(first, dict):
+        return False
+    fields = first.keys()
+    return all(
+        isinstance(item, dict)
+        and item.keys() == fields
+        and not any(isinstance(v, (dict, list)) for v in item.values())
+        for item in value
+    )
+
+
+def _extract(value: Any, tables: List[Any]) -> Any:
+    """``value`` with its tables swapped for ``{"$arrow": n}`` placeholders."""
+    if _is_table(value):
+        try:
+            columns = {field: [item[field] for item in value] for field in value[0]}
+            tables.append(pa.Table.from_pydict(columns))
+            return {_TABLE: len(tables) - 1}
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            # Mixed types in a column: leave the list as JSON
+            pass
+    if isinstance(value, dict):
+        return {key: _extract(item, tables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_extract(item, tables) for item in value]
+    return value
+
+
+def _rows(table: Any) -> List[Dict[str, Any]]:
+    # Whole columns through NumPy are far faster than Table.to_pylist, which
+    # converts cell by cell; columns with nulls still need it to keep None
+    columns = [
+        column.to_pylist()
+        if column.null_count
+        else column.to_numpy(zero_copy_only=False).tolist()
+        for column in table.columns
+    ]
+    fields = table.column_names
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def _restore(value: Any, tables: List[List[Dict[str, Any]]]) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and _TABLE in value:
+            return tables[value[_TABLE]]
+        return {key: _restore(item, tables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore(item, tables) for item in value]
+    return value
+
+
+def encode_arrow(value: Any, compression: str = "none") -> bytes:
+    """One Arrow IPC stream holding the JSON part, then one per table."""
+    tables: List[Any] = []
+    rest = _extract(value, tables)
+    options = pa.ipc.IpcWriteOptions(
+        compression=None if compression == "none" else compression
+    )
+    sink = pa.BufferOutputStream()
+    header = pa.schema(
+        [], metadata={"json": json.dumps(rest), "tables": str(len(tables))}
+    )
+    for schema, table in [(header, None), *((t.schema, t) for t in tables)]:
+        with pa.ipc.new_stream(sink, schema, options=options) as writer:
+            if table is not None:
+                writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_arrow(body: bytes) -> Any:
+    source = pa.BufferReader(body)
+    header = pa.ipc.open_stream(source)
+    metadata = header.schema.metadata
+    header.read_all()
+    tables = [
+        _rows(pa.ipc.open_stream(source).read_all())
+        for _ in range(int(metadata[b"tables"]))
+    ]
+    return _restore(json.loads(metadata[b"json"]), tables)
+
+
+def encode(value: Any, media_type: str, options: Dict[str, str]) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    if media_type == ARROW:
+        # Codecs Arrow IPC supports; anything else is sent uncompressed
+        compression = options.get("compression", "none")
+        if compression not in ("zstd", "lz4") or not pa.Codec.is_available(compression):
+            compression = "none"
+        return encode_arrow(value, compression)
+    return json.dumps(value).encode()
+
+
+def decode(body: bytes, content_type: str) -> Any:
+    """The value of a response body, by its Content-Type."""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    if media_type == ARROW:
+        return decode_arrow(body)
+    return json.loads(body)
@@ -14,7 +14,7 @@ if __name__ == "__main__":
     from server import mcp
 
     print("Starting Travel Tools MCP Server...")
-    print("Available tools: get_flights, get_stays")
+    print("Available tools: get_flights, get_stays, get_flights_batch, get_stays_batch")
     print("Server ready for connections...")
 
     # This will start the FastMCP server in stdio mode
@@ -0,0 +1,302 @@
+"""
+Columnar, indexed flight and stay inventory for the travel MCP tools.
+
+Records are loaded once from CSV, JSONL or Parquet into NumPy arrays, with
+repetitive text stored as integer codes. Rows are sorted by (route or city,
+price), so each index key maps to a contiguous slice whose prices are already
+ascending. A budget-filtered top-k query is then a
+dict lookup, one binary search and a k-row slice: O(log n + k).
+"""
+
+import csv
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FLIGHT_FIELDS = [
+    "origin",
+    "destination",
+    "date",
+    "name",
+    "description",
+    "price_estimate",
+    "duration_hours",
+    "airline",
+]
+STAY_FIELDS = ["city", "name", "description", "nightly_rate"]
+
+
+def _normalize(value: str) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+def _factorize(values) -> tuple[list, np.ndarray]:
+    """Encode values as int codes in first-seen order, without sorting strings."""
+    values = values.tolist()
+    vocab = list(dict.fromkeys(values))
+    lookup = {value: code for code, value in enumerate(vocab)}
+    codes = np.fromiter(map(lookup.__getitem__, values), np.int64, len(values))
+    return vocab, codes
+
+
+def _normalized_codes(values: np.ndarray) -> tuple[list, np.ndarray]:
+    # Normalize each distinct value once rather than every row, then merge
+    # distinct raw values that normalize to the same key
+    raw_vocab, raw_codes = _factorize(values)
+    vocab, remap = _factorize(np.asarray([_normalize(v) for v in raw_vocab]))
+    return vocab, remap[raw_codes]
+
+
+class _Categorical:
+    """Low-cardinality text column stored as int32 codes into a vocabulary."""
+
+    def __init__(self, values: np.ndarray):
+        vocab, codes = _factorize(values)
+        self.vocab = [str(value) for value in vocab]
+        self.codes = codes.astype(np.int32)
+
+    def __getitem__(self, row: int) -> str:
+        return self.vocab[self.codes[row]]
+
+
+def load_columns(path: str) -> Dict[str, np.ndarray]:
+    """Read a CSV, JSONL or Parquet file into one array per column."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".csv"):
+        try:
+            import pyarrow.csv as pa_csv
+            import pyarrow.parquet as pq
+        except ImportError:
+            if extension == ".parquet":
+                raise ImportError("Reading Parquet inventories requires pyarrow")
+        else:
+            if extension == ".parquet":
+                table = pq.read_table(path)
+            else:
+                table = pa_csv.read_csv(path)
+            return {
+                name: table.column(name).to_numpy(zero_copy_only=False)
+                for name in table.column_names
+            }
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".csv":
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return {}
+            return {
+                name: np.asarray(values) for name, values in zip(header, zip(*reader))
+            }
+        if extension in (".jsonl", ".ndjson"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f"Unsupported inventory format: {path}")
+    if not rows:
+        return {}
+    return {name: np.asarray([row[name] for row in rows]) for name in rows[0]}
+
+
+class _SortedIndex:
+    """Maps a key to the slice of rows sharing it, with prices ascending."""
+
+    def __init__(self, codes: np.ndarray, keys: list, prices: np.ndarray):
+        # Primary sort on the key code, secondary on price
+        self.order = np.lexsort((prices, codes))
+        self.prices = prices[self.order]
+        sorted_codes = codes[self.order]
+        key_codes = np.arange(len(keys))
+        starts = np.searchsorted(sorted_codes, key_codes, side="left")
+        ends = np.searchsorted(sorted_codes, key_codes, side="right")
+        self.slices = {
+            key: (start, end)
+            for key, start, end in zip(keys, starts.tolist(), ends.tolist())
+        }
+
+    def top_k(self, key, max_price: float, k: int) -> np.ndarray:
+        """Row numbers of the k cheapest rows for ``key`` priced <= max_price."""
+        bounds = self.slices.get(key)
+        if bounds is None:
+            return np.empty(0, dtype=np.intp)
+        start, end = bounds
+        stop = start + int(
+            np.searchsorted(self.prices[start:end], max_price, side="right")
+        )
+        return self.order[start : min(stop, start + k)]
+
+
+class FlightInventory:
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        missing = set(FLIGHT_FIELDS) - set(columns)
+        if missing:
+            raise ValueError(f"Flight inventory is missing columns: {sorted(missing)}")
+        self.name = columns["name"].astype(str)
+        self.description = _Categorical(columns["description"])
+        self.airline = _Categorical(columns["airline"])
+        self.price = columns["price_estimate"].astype(np.float64)
+        self.duration = columns["duration_hours"].astype(np.float32)
+        origins, origin = _normalized_codes(columns["origin"])
+        destinations, destination = _normalized_codes(columns["destination"])
+        dates, date = _factorize(np.char.strip(columns["date"].astype(str)))
+        # Pack (origin, destination, date) into one integer per row
+        packed = (origin * len(destinations) + destination) * len(dates) + date
+        routes, codes = np.unique(packed, return_inverse=True)
+        route_origin, rest = np.divmod(routes, len(destinations) * len(dates))
+        route_destination, route_date = np.divmod(rest, len(dates))
+        keys = [
+            (origins[o], destinations[d], dates[t])
+            for o, d, t in zip(
+                route_origin.tolist(), route_destination.tolist(), route_date.tolist()
+            )
+        ]
+        self.index = _SortedIndex(codes, keys, self.price)
+
+    def __len__(self):
+        return len(self.price)
+
+    def search(
+        self, origin: str, destination: str, date: str, budget: float, k: int = 3
+    ) -> List[Dict[str, Any]]:
+        key = (_normalize(origin), _normalize(destination), date.strip())
+        rows = self.index.top_k(key, budget, k)
+        return [
+            {
+                "name": str(self.name[row]),
+                "description": self.description[row],
+                "price_estimate": round(float(self.price[row]), 2),
+                "duration_hours": round(float(self.duration[row]), 1),
+                "airline": self.airline[row],
+            }
+            for row in rows.tolist()
+        ]
+
+
+class StayInventory:
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        missing = set(STAY_FIELDS) - set(columns)
+        if missing:
+            raise ValueError(f"Stay inventory is missing columns: {sorted(missing)}")
+        self.name = columns["name"].astype(str)
+        self.description = _Categorical(columns["description"])
+        self.nightly_rate = columns["nightly_rate"].astype(np.float64)
+        cities, codes = _normalized_codes(columns["city"])
+        self.index = _SortedIndex(codes, cities, self.nightly_rate)
+
+    def __len__(self):
+        return len(self.nightly_rate)
+
+    def search(
+        self, city: str, nights: int, budget: float, k: int = 3
+    ) -> List[Dict[str, Any]]:
+        nights = max(nights, 1)
+        # The total price is monotonic in the nightly rate, so search on that
+        rows = self.index.top_k(_normalize(city), budget / nights, k)
+        return [
+            {
+                "name": str(self.name[row]),
+                "description": self.description[row],
+                "price_estimate": round(float(self.nightly_rate[row]) * nights, 2),
+                "duration_hours": nights * 24,
+                "nights": nights,
+            }
+            for row in rows.tolist()
+        ]
+
+
+def load_flights(path: Optional[str]) -> Optional[FlightInventory]:
+    if not path:
+        return None
+    inventory = FlightInventory(load_columns(path))
+    # stdout carries the MCP protocol, so log to stderr
+    print(f"Loaded {len(inventory)} flights from {path}", file=sys.stderr)
+    return inventory
+
+
+def load_stays(path: Optional[str]) -> Optional[StayInventory]:
+    if not path:
+        return None
+    inventory = StayInventory(load_columns(path))
+    print(f"Loaded {len(inventory)} stays from {path}", file=sys.stderr)
+    return inventory
+
+
+def write_sample(
+    flights_path: str,
+    stays_path: str,
+    rows: int,
+    cities: List[str],
+    dates: List[str],
+    seed: int = 0,
+):
+    """Write a synthetic inventory in the same shape the random tools return."""
+    from server import AIRLINES, HOTEL_CHAINS, HOTEL_TYPES
+
+    rng = np.random.default_rng(seed)
+    origin = rng.integers(0, len(cities), rows)
+    # Offset by 1..n-1 so no flight goes from a city to itself
+    destination = (origin + rng.integers(1, len(cities), rows)) % len(cities)
+    airline = rng.integers(0, len(AIRLINES), rows)
+    flights = {
+        "origin": np.asarray(cities)[origin],
+        "destination": np.asarray(cities)[destination],
+        "date": np.asarray(dates)[rng.integers(0, len(dates), rows)],
+        "name": np.char.add(
+            np.char.add(np.asarray(AIRLINES)[airline], " "),
+            rng.integers(100, 10000, rows).astype(str),
+        ),
+        "description": np.char.add(
+            np.asarray(AIRLINES)[airline], np.asarray(" flight")
+        ),
+        "price_estimate": rng.integers(200, 801, rows),
+        "duration_hours": np.round(rng.uniform(2.0, 10.0, rows), 1),
+        "airline": np.asarray(AIRLINES)[airline],
+    }
+    city = np.asarray(cities)[rng.integers(0, len(cities), rows)]
+    kind = np.asarray(HOTEL_TYPES)[rng.integers(0, len(HOTEL_TYPES), rows)]
+    stays = {
+        "city": city,
+        "name": np.char.add(
+            np.char.add(
+                np.asarray(HOTEL_CHAINS)[rng.integers(0, len(HOTEL_CHAINS), rows)],
+                np.char.add(" ", city),
+            ),
+            np.char.add(" ", kind),
+        ),
+        "description": np.char.add("Modern ", np.char.lower(kind)),
+        "nightly_rate": rng.integers(80, 401, rows),
+    }
+    for path, columns in ((flights_path, flights), (stays_path, stays)):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*(values.tolist() for values in columns.values())))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a sample CSV inventory")
+    parser.add_argument("--flights", default="flights.csv")
+    parser.add_argument("--stays", default="stays.csv")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cities", default="New York,Paris,London,Tokyo,Rome,Dubai,Sydney,Lima"
+    )
+    parser.add_argument("--start-date", default="2025-06-01")
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    start = np.datetime64(args.start_date)
+    dates = [str(start + np.timedelta64(day, "D")) for day in range(args.days)]
+    write_sample(
+        args.flights,
+        args.stays,
+        args.rows,
+        args.cities.split(","),
+        dates,
+        seed=args.seed,
+    )
@@ -1,11 +1,18 @@
+import os
 import random
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
+import numpy as np
 from fastmcp import FastMCP
+from inventory import load_flights, load_stays
 
 mcp = FastMCP("Travel Tools Server")
 
+# Optional on-disk catalogs; without them the tools generate random results
+FLIGHTS = load_flights(os.getenv("MCP_FLIGHTS_INVENTORY"))
+STAYS = load_stays(os.getenv("MCP_STAYS_INVENTORY"))
+
 AIRLINES = [
     "Emirates",
     "Etihad",
@@ -48,6 +55,8 @@ def get_flights(
     Returns:
         List of flight options with details
     """
+    if FLIGHTS is not None:
+        return FLIGHTS.search(origin, destination, start_date, budget)
 
     flights = []
 
@@ -76,7 +85,7 @@ def get_flights(
 
 @mcp.tool()
 def get_stays(
-    destination: str, check_in: str, check_out: str, budget: float = 2000
+    destination: str, check_in: str, check_out: str, budget: float = 2000.0
 ) -> List[Dict[str, Any]]:
     """
     Get stay options in a city.
@@ -93,6 +102,8 @@ def get_stays(
     checkin_date = datetime.strptime(check_in, "%Y-%m-%d")
     checkout_date = datetime.strptime(check_out, "%Y-%m-%d")
     nights = (checkout_date - checkin_date).days
+    if STAYS is not None:
+        return STAYS.search(destination, nights, budget)
 
     stays = []
 
@@ -119,6 +130,153 @@ def get_stays(
     return stays
 
 
+def _top_k_by_price(prices: np.ndarray, budgets: np.ndarray, k: int):
+    """Pick the k cheapest in-budget columns of each row.
+
+    Uses a partial selection so only the k survivors per row get sorted.
+    Returns the chosen column indices and a mask of which of them are valid.
+    """
+    keys = np.where(prices <= budgets[:, None], prices, np.inf).astype(float)
+    k = min(k, keys.shape[1])
+    if k <= 0:
+        empty = np.zeros((keys.shape[0], 0), dtype=int)
+        return empty, empty.astype(bool)
+    if k < keys.shape[1]:
+        candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(k), keys.shape).copy()
+    order = np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1)
+    chosen = np.take_along_axis(candidates, order, axis=1)
+    return chosen, np.isfinite(np.take_along_axis(keys, chosen, axis=1))
+
+
+def _take(values: np.ndarray, chosen: np.ndarray) -> list:
+    return np.take_along_axis(values, chosen, axis=1).tolist()
+
+
+def _format_batch(columns: Dict[str, list], valid: np.ndarray, columnar: bool):
+    names = list(columns)
+    results = []
+    for row, row_valid in enumerate(valid.tolist()):
+        keep = [i for i, ok in enumerate(row_valid) if ok]
+        if columnar:
+            results.append(
+                {name: [columns[name][row][i] for i in keep] for name in names}
+            )
+        else:
+            results.append(
+                [{name: columns[name][row][i] for name in names} for i in keep]
+            )
+    if columnar:
+        return {"columns": names, "results": results}
+    return {"results": results}
+
+
+@mcp.tool()
+def get_flights_batch(
+    queries: List[Dict[str, Any]],
+    per_query: int = 3,
+    top_k: Optional[int] = None,
+    columnar: bool = False,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Get flight options for many trips at once.
+
+    Args:
+        queries: Objects with origin, destination, start_date, end_date and budget
+        per_query: Number of candidate flights generated per query
+        top_k: Keep only the k cheapest flights within budget (default: per_query)
+        columnar: Return one list per field instead of one object per flight
+        seed: Seed for reproducible results
+
+    Returns:
+        {"results": [...]} with one entry per query, in query order
+    """
+    rng = np.random.default_rng(seed)
+    shape = (len(queries), per_query)
+    budgets = np.array([float(q.get("budget", np.inf)) for q in queries])
+
+    airline_idx = rng.integers(0, len(AIRLINES), size=shape)
+    prices = rng.integers(200, 801, size=shape)
+    durations = np.round(rng.uniform(2.0, 10.0, size=shape), 1)
+    numbers = rng.integers(100, 10000, size=shape)
+
+    chosen, valid = _top_k_by_price(prices, budgets, top_k or per_query)
+    airlines = [[AIRLINES[i] for i in row] for row in _take(airline_idx, chosen)]
+    routes = [
+        f"from {q.get('origin', 'unknown')} to {q.get('destination', 'unknown')}"
+        for q in queries
+    ]
+    columns = {
+        "name": [
+            [f"{airline} {number}" for airline, number in zip(row, numbers_row)]
+            for row, numbers_row in zip(airlines, _take(numbers, chosen))
+        ],
+        "description": [
+            [f"{airline} flight {route}" for airline in row]
+            for row, route in zip(airlines, routes)
+        ],
+        "price_estimate": _take(prices, chosen),
+        "duration_hours": _take(durations, chosen),
+        "airline": airlines,
+    }
+    return _format_batch(columns, valid, columnar)
+
+
+@mcp.tool()
+def get_stays_batch(
+    queries: List[Dict[str, Any]],
+    per_query: int = 3,
+    top_k: Optional[int] = None,
+    columnar: bool = False,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Get stay options for many trips at once.
+
+    Args:
+        queries: Objects with destination, check_in, check_out and budget
+        per_query: Number of candidate stays generated per query
+        top_k: Keep only the k cheapest stays within budget (default: per_query)
+        columnar: Return one list per field instead of one object per stay
+        seed: Seed for reproducible results
+
+    Returns:
+        {"results": [...]} with one entry per query, in query order
+    """
+    rng = np.random.default_rng(seed)
+    shape = (len(queries), per_query)
+    budgets = np.array([float(q.get("budget", 2000.0)) for q in queries])
+    nights = (
+        np.array([q["check_out"] for q in queries], dtype="datetime64[D]")
+        - np.array([q["check_in"] for q in queries], dtype="datetime64[D]")
+    ).astype(int)
+
+    chain_idx = rng.integers(0, len(HOTEL_CHAINS), size=shape)
+    type_idx = rng.integers(0, len(HOTEL_TYPES), size=shape)
+    prices = rng.integers(80, 401, size=shape) * nights[:, None]
+
+    chosen, valid = _top_k_by_price(prices, budgets, top_k or per_query)
+    destinations = [q["destination"] for q in queries]
+    chains = [[HOTEL_CHAINS[i] for i in row] for row in _take(chain_idx, chosen)]
+    types = [[HOTEL_TYPES[i] for i in row] for row in _take(type_idx, chosen)]
+    columns = {
+        "name": [
+            [f"{chain} {city} {kind}" for chain, kind in zip(chain_row, type_row)]
+            for chain_row, type_row, city in zip(chains, types, destinations)
+        ],
+        "description": [
+            [f"Modern {kind.lower()} in the heart of {city}" for kind in type_row]
+            for type_row, city in zip(types, destinations)
+        ],
+        "price_estimate": _take(prices, chosen),
+        "duration_hours": [[int(n) * 24] * len(row) for n, row in zip(nights, types)],
+        "nights": [[int(n)] * len(row) for n, row in zip(nights, types)],
+    }
+    return _format_batch(columns, valid, columnar)
+
+
 # This is the key part - FastMCP needs to run when the script is executed
 if __name__ == "__main__":
     mcp.run()
@@ -1,8 +1,44 @@
-from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class TravelRequest(BaseModel):
+    origin: Optional[str] = Field(default=None, description="The origin of the travel")
     destination: str = Field(description="The destination of the travel")
     start_date: str = Field(description="The start date of the travel")
     end_date: str = Field(description="The end date of the travel")
     budget: float = Field(description="The budget for the travel")
+
+
+class TravelOption(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    name: str = Field(description="Display name of the option")
+    description: str = Field(default="", description="Short description")
+    price_estimate: float = Field(description="Estimated price in USD")
+    duration_hours: Optional[float] = Field(default=None, description="Duration")
+
+    @field_validator("price_estimate", "duration_hours", mode="before")
+    @classmethod
+    def _strip_currency(cls, value):
+        # Models sometimes answer "$1,200" or "2.5 hours" instead of a number
+        if isinstance(value, str):
+            value = value.replace("$", "").replace(",", "").strip().split(" ")[0]
+        return value
+
+
+class FlightOption(TravelOption):
+    airline: Optional[str] = Field(default=None, description="Operating airline")
+
+
+class StayOption(TravelOption):
+    nights: Optional[int] = Field(default=None, description="Nights covered")
+
+
+class ActivityOption(TravelOption):
+    pass
+
+
+class FlightResults(BaseModel):
+    flights: List[FlightOption]
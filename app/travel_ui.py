@@ -1,65 +1,205 @@
+import json
+import os
+
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Host agent the UI plans trips with
+HOST_URL = os.getenv("UI_HOST_URL", "http://localhost:8000")
+# Seconds a finished plan is reused for the same inputs, and how many are kept
+CACHE_TTL = float(os.getenv("UI_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("UI_CACHE_MAX_ENTRIES", "256"))
+# Seconds to connect, and to wait for the next streamed event; the host gives
+# up on its sub-agents after HOST_REQUEST_BUDGET (55s)
+CONNECT_TIMEOUT = float(os.getenv("UI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("UI_READ_TIMEOUT", "65"))
+
+SECTIONS = {
+    "flights": ("✈️ Flights", "No flights returned."),
+    "stays": ("🏨 Stays", "No stays returned."),
+    "activities": ("🗺️ Activities", "No activities returned."),
+}
+
+# Columns of an option table, in order, with how to show them
+OPTION_COLUMNS = {
+    "name": st.column_config.TextColumn("Name"),
+    "price_estimate": st.column_config.NumberColumn("Price", format="$%.2f"),
+    "duration_hours": st.column_config.NumberColumn("Hours", format="%.1f"),
+    "airline": st.column_config.TextColumn("Airline"),
+    "nights": st.column_config.NumberColumn("Nights"),
+    "description": st.column_config.TextColumn("Description", width="large"),
+}
+ITINERARY_COLUMNS = {
+    "flight": st.column_config.TextColumn("Flight"),
+    "stay": st.column_config.TextColumn("Stay"),
+    "activities": st.column_config.TextColumn("Activities", width="large"),
+    "total_price": st.column_config.NumberColumn("Total", format="$%.2f"),
+    "remaining_budget": st.column_config.NumberColumn("Left", format="$%.2f"),
+}
+
+
+class NotCached(Exception):
+    pass
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    # One keep-alive connection pool for every session and rerun of this app
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+    return session
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def finished_plan(origin, destination, start_date, end_date, budget, _plan=None):
+    """The plan cached for these inputs; pass ``_plan`` to cache it.
+
+    Raises ``NotCached`` on a miss, which Streamlit does not cache. The host
+    is called outside this function: Streamlit would replay the sections drawn
+    while streaming on every later hit.
+    """
+    if _plan is None:
+        raise NotCached
+    return _plan
+
+
+def stream_plan(payload, on_event):
+    """Call the host's /stream, handing each event to ``on_event``; the plan."""
+    plan = {"itineraries": []}
+    with http_session().post(
+        f"{HOST_URL}/stream",
+        json=payload,
+        # Someone is waiting on this page, so it goes ahead of batch work
+        headers={"X-A2A-Priority": "interactive"},
+        stream=True,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "section" and event["section"] in SECTIONS:
+                plan[event["section"]] = event["data"]
+                on_event(event)
+            elif event["type"] == "itineraries":
+                plan["itineraries"] = event["data"]
+                on_event(event)
+            elif event["type"] == "done":
+                plan["status"] = event["status"]
+            elif event["type"] == "error":
+                raise RuntimeError(event.get("error"))
+    return plan
+
+
+def complete(plan):
+    # Plans with a section that failed or timed out are not cached
+    states = [section["state"] for section in plan.get("status", {}).values()]
+    return len(states) == len(SECTIONS) and all(state == "ok" for state in states)
+
+
+def render_section(placeholder, title, data):
+    with placeholder.container():
+        st.subheader(title)
+        if isinstance(data, list) and data:
+            # One table for the whole list instead of a write per item
+            columns = {k: c for k, c in OPTION_COLUMNS.items() if k in data[0]}
+            st.dataframe(
+                data,
+                column_order=list(columns),
+                column_config=columns,
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.markdown(data or "Nothing found.")
+
+
+def render_itineraries(placeholder, itineraries):
+    if not itineraries:
+        placeholder.empty()
+        return
+    rows = [
+        {
+            "flight": itinerary["flight"]["name"],
+            "stay": itinerary["stay"]["name"],
+            "activities": ", ".join(a["name"] for a in itinerary["activities"]),
+            "total_price": itinerary["total_price"],
+            "remaining_budget": itinerary["remaining_budget"],
+        }
+        for itinerary in itineraries
+    ]
+    with placeholder.container():
+        st.subheader("🧳 Best Itineraries Within Budget")
+        st.dataframe(
+            rows,
+            column_config=ITINERARY_COLUMNS,
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def render_plan(placeholders, plan):
+    for name, (title, empty) in SECTIONS.items():
+        render_section(placeholders[name], title, plan.get(name, empty))
+    render_itineraries(placeholders["itineraries"], plan.get("itineraries"))
+
 
 st.set_page_config(page_title="ADK-Powered Travel Planner", page_icon="✈️")
 st.title("🌍 ADK-Powered Travel Planner")
-origin = st.text_input("Where are you flying from?", placeholder="e.g., New York")
-destination = st.text_input("Destination", placeholder="e.g., Paris")
-start_date = st.date_input("Start Date")
-end_date = st.date_input("End Date")
-budget = st.number_input("Budget (in USD)", min_value=100, step=50)
-if st.button("Plan My Trip ✨"):
+# A form, so that editing a field does not rerun the page until it is submitted
+with st.form("trip"):
+    origin = st.text_input("Where are you flying from?", placeholder="e.g., New York")
+    destination = st.text_input("Destination", placeholder="e.g., Paris")
+    start_date = st.date_input("Start Date")
+    end_date = st.date_input("End Date")
+    budget = st.number_input("Budget (in USD)", min_value=100, step=50)
+    submitted = st.form_submit_button("Plan My Trip ✨")
+
+placeholders = {name: st.empty() for name in [*SECTIONS, "itineraries"]}
+if submitted:
     if not all([origin, destination, start_date, end_date, budget]):
         st.warning("Please fill in all the details.")
     else:
+        for name, (title, _) in SECTIONS.items():
+            with placeholders[name].container():
+                st.subheader(title)
+                st.caption("Searching...")
+
+        def on_event(event):
+            # Each section is drawn as soon as its sub-agent finishes
+            if event["type"] == "section":
+                title, _ = SECTIONS[event["section"]]
+                render_section(placeholders[event["section"]], title, event["data"])
+            elif event["type"] == "itineraries":
+                render_itineraries(placeholders["itineraries"], event["data"])
+
         payload = {
-            "origin": origin,
-            "destination": destination,
+            "origin": origin.strip(),
+            "destination": destination.strip(),
             "start_date": str(start_date),
             "end_date": str(end_date),
             "budget": budget,
         }
-        response = requests.post("http://localhost:8000/run", json=payload)
-        if response.ok:
-            data = response.json()
-
-            # Display Flights
-            st.subheader("✈️ Flights")
-            flights_data = data.get("flights", "No flights returned.")
-            if isinstance(flights_data, list):
-                for flight in flights_data:
-                    st.write(f"**{flight['name']}** - ${flight['price_estimate']}")
-                    st.write(f"_{flight['description']}_")
-                    duration = flight.get("duration_hours", "N/A")
-                    st.write(f"Duration: {duration} hours")
-                    st.write("---")
-            else:
-                st.markdown(flights_data)
-
-            # Display Stays
-            st.subheader("🏨 Stays")
-            stays_data = data.get("stays", "No stays returned.")
-            if isinstance(stays_data, list):
-                for stay in stays_data:
-                    st.write(f"**{stay['name']}** - ${stay['price_estimate']}")
-                    st.write(f"_{stay['description']}_")
-                    duration = stay.get("duration_hours", "N/A")
-                    st.write(f"Duration: {duration} hours")
-                    st.write("---")
-            else:
-                st.markdown(stays_data)
-
-            # Display Activities
-            st.subheader("🗺️ Activities")
-            activities_data = data.get("activities", "No activities returned.")
-            if isinstance(activities_data, list):
-                for activity in activities_data:
-                    st.write(f"**{activity['name']}** - ${activity['price_estimate']}")
-                    st.write(f"_{activity['description']}_")
-                    duration = activity.get("duration_hours", "N/A")
-                    st.write(f"Duration: {duration} hours")
-                    st.write("---")
-            else:
-                st.markdown(activities_data)
+        try:
+            plan = finished_plan(**payload)
+        except NotCached:
+            try:
+                plan = stream_plan(payload, on_event)
+            except (requests.RequestException, RuntimeError, ValueError):
+                plan = None
+                for placeholder in placeholders.values():
+                    placeholder.empty()
+                st.error("Failed to fetch travel plan. Please try again.")
+            if plan is not None and complete(plan):
+                finished_plan(**payload, _plan=plan)
+        if plan is None:
+            st.session_state.pop("plan", None)
         else:
-            st.error("Failed to fetch travel plan. Please try again.")
+            st.session_state["plan"] = plan
+
+# Other reruns show the last plan again without calling the host
+if "plan" in st.session_state:
+    render_plan(placeholders, st.session_state["plan"])